@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,19 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def temp_media_root(mock_media):
+    # Загрузки и миниатюры тестов не должны попадать в настоящий MEDIA_ROOT.
+    yield mock_media
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_settings(django_test_environment):
+    # Те же настройки, что у manage.py test (core/testing.py);
+    # до создания тестовой базы.
+    from django.test.utils import override_settings
+    from core.testing import TEST_SETTINGS
+    with override_settings(**TEST_SETTINGS):
+        yield
@@ -0,0 +1,318 @@
+# core/metrics.py
+'''Время и запросы к базе по вьюхам.
+
+MetricsMiddleware замеряет каждый запрос: число SQL-запросов и их
+время, время отрисовки шаблонов (шаблоны считает бэкенд
+core.templates.TimedDjangoTemplates) и полное время. Замеры копятся
+гистограммами в памяти процесса по имени вьюхи (posts:index,
+posts:follow_index, ...) и раз в METRICS_FLUSH_INTERVAL секунд
+прибавляются к счётчикам в общем кэше, поэтому /metrics/ показывает
+сумму по всем процессам в текстовом формате Prometheus. Сброс - это
+сотни обращений к кэшу, поэтому он идёт в фоновом потоке, а не
+в запросе, который пересёк границу интервала.
+
+Запросы дольше METRICS_SLOW_REQUEST секунд попадают в журнал вместе
+с самыми долгими SQL-запросами.
+
+ServerTimingMiddleware отдаёт замеры запроса в заголовке
+Server-Timing: база, кэш, миниатюры, шаблоны и полное время. Фазы
+могут перекрываться: запросы к кэшу из миниатюр входят в обе.
+'''
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from .queries import watch_queries
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics'
+OTHER_VIEW = 'other'
+# Метрика -> (описание, границы корзин, единица хранения в кэше).
+# Время хранится в микросекундах: кэш умеет прибавлять только целые.
+HISTOGRAMS = {
+    'request_seconds': ('Полное время запроса.',
+                        'METRICS_SECONDS_BUCKETS', 1_000_000),
+    'db_seconds': ('Время SQL-запросов.',
+                   'METRICS_SECONDS_BUCKETS', 1_000_000),
+    'template_seconds': ('Время отрисовки шаблонов.',
+                         'METRICS_SECONDS_BUCKETS', 1_000_000),
+    'db_queries': ('Число SQL-запросов.',
+                   'METRICS_QUERIES_BUCKETS', 1),
+}
+# Методы кэша, время которых относится к фазе cache.
+CACHE_METHODS = ('get', 'get_many', 'set', 'set_many', 'add', 'delete',
+                 'delete_many', 'incr', 'decr', 'has_key', 'get_or_set')
+# Фазы в Server-Timing, в порядке вывода.
+SERVER_TIMING_PHASES = ('db', 'cache', 'thumbnail', 'template')
+
+_state = threading.local()
+_lock = threading.Lock()
+# Один сброс за раз: render() дожидается начатого в фоне.
+_flush_lock = threading.Lock()
+# (метрика, вьюха, корзина или 'sum'/'count') -> прибавка с прошлого сброса.
+_pending = defaultdict(int)
+_flushed_at = time.monotonic()
+
+
+class RequestTimer:
+    '''Замеры одного запроса: время по фазам и SQL-запросы.'''
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.queries = []
+        self._depth = defaultdict(int)
+
+    def add(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    @contextmanager
+    def phase(self, name):
+        # Вложенные замеры одной фазы (шаблон внутри шаблона)
+        # считаются один раз.
+        self._depth[name] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] -= 1
+            if not self._depth[name]:
+                self.add(name, time.perf_counter() - started)
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.add('db', duration)
+            self.queries.append((sql, duration))
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+def current():
+    '''Замеры текущего запроса или None вне запроса.'''
+    return getattr(_state, 'timer', None)
+
+
+@contextmanager
+def phase(name):
+    '''Относит время блока к фазе name текущего запроса.'''
+    timer = current()
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
+
+
+def _timed(method):
+    def timed(*args, **kwargs):
+        with phase('cache'):
+            return method(*args, **kwargs)
+    return timed
+
+
+def instrument_cache(backend):
+    '''Подменяет методы экземпляра кэша так, чтобы их время
+    относилось к фазе cache. Повторный вызов ничего не делает.'''
+    if getattr(backend, '_timed', False):
+        return
+    for name in CACHE_METHODS:
+        setattr(backend, name, _timed(getattr(backend, name)))
+    backend._timed = True
+
+
+def view_names():
+    '''Имена всех вьюх из urls.py с пространствами имён.'''
+    names = {OTHER_VIEW}
+
+    def walk(patterns, namespace):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns,
+                     ':'.join(filter(None, (namespace, pattern.namespace))))
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                names.add(':'.join(filter(None, (namespace, pattern.name))))
+
+    walk(get_resolver().url_patterns, '')
+    return sorted(names)
+
+
+def _buckets(metric):
+    return getattr(settings, HISTOGRAMS[metric][1])
+
+
+def observe(metric, view, value):
+    '''Добавляет значение в гистограмму metric вьюхи view.'''
+    unit = HISTOGRAMS[metric][2]
+    bucket = next((le for le in _buckets(metric) if value <= le), '+Inf')
+    with _lock:
+        _pending[metric, view, bucket] += 1
+        _pending[metric, view, 'sum'] += round(value * unit)
+        _pending[metric, view, 'count'] += 1
+
+
+def _key(metric, view, part):
+    return f'{KEY_PREFIX}:{metric}:{view}:{part}'
+
+
+def flush():
+    '''Прибавляет накопленное в процессе к счётчикам в кэше.'''
+    global _flushed_at
+    with _flush_lock:
+        with _lock:
+            pending = dict(_pending)
+            _pending.clear()
+            _flushed_at = time.monotonic()
+        for (metric, view, part), delta in pending.items():
+            key = _key(metric, view, part)
+            cache.add(key, 0, timeout=None)
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                # Ключ вытеснили между add и incr.
+                cache.set(key, delta, timeout=None)
+
+
+def _maybe_flush():
+    '''Раз в METRICS_FLUSH_INTERVAL секунд запускает flush
+    в фоновом потоке.'''
+    global _flushed_at
+    with _lock:
+        now = time.monotonic()
+        if now - _flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        _flushed_at = now
+    threading.Thread(target=flush, name='metrics-flush',
+                     daemon=True).start()
+
+
+def _number(value):
+    return ('%f' % value).rstrip('0').rstrip('.')
+
+
+def render():
+    '''Сумма гистограмм всех процессов в формате Prometheus.'''
+    flush()
+    # Сначала счётчики запросов, затем корзины только тех вьюх,
+    # к которым обращались.
+    names = view_names()
+    counts = cache.get_many([_key('request_seconds', view, 'count')
+                             for view in names])
+    views = [view for view in names
+             if counts.get(_key('request_seconds', view, 'count'))]
+    parts = {metric: [*_buckets(metric), '+Inf', 'sum', 'count']
+             for metric in HISTOGRAMS}
+    values = cache.get_many([_key(metric, view, part)
+                             for metric in HISTOGRAMS for view in views
+                             for part in parts[metric]])
+    lines = []
+    for metric, (help_text, _, unit) in HISTOGRAMS.items():
+        name = f'{settings.METRICS_NAMESPACE}_{metric}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for view in views:
+            if not values.get(_key(metric, view, 'count')):
+                continue
+            cumulative = 0
+            for le in parts[metric][:-2]:
+                cumulative += values.get(_key(metric, view, le), 0)
+                bound = le if le == '+Inf' else _number(le)
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                             f'{cumulative}')
+            total = values.get(_key(metric, view, 'sum'), 0) / unit
+            lines.append(f'{name}_sum{{view="{view}"}} {_number(total)}')
+            lines.append(f'{name}_count{{view="{view}"}} '
+                         f'{values[_key(metric, view, "count")]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _log_slow(request, view, timer, total):
+    by_sql = defaultdict(lambda: [0, 0.0])
+    for sql, duration in timer.queries:
+        by_sql[sql][0] += 1
+        by_sql[sql][1] += duration
+    slowest = sorted(by_sql.items(), key=lambda item: -item[1][1])
+    breakdown = ''.join(
+        f'\n  {duration * 1000:.1f} мс, {count} раз: {sql}'
+        for sql, (count, duration) in
+        slowest[:settings.METRICS_SLOW_REQUEST_QUERIES]
+    )
+    logger.warning(
+        'Медленный запрос %s %s (%s): %.0f мс, SQL %d за %.0f мс, '
+        'шаблоны %.0f мс%s',
+        request.method, request.get_full_path(), view, total * 1000,
+        len(timer.queries), timer.phases['db'] * 1000,
+        timer.phases['template'] * 1000, breakdown,
+    )
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _state.timer = RequestTimer()
+        for backend in caches.all():
+            instrument_cache(backend)
+        try:
+            with watch_queries(timer.execute):
+                response = self.get_response(request)
+        finally:
+            _state.timer = None
+        total = timer.total
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.url_name else OTHER_VIEW
+        observe('request_seconds', view, total)
+        observe('db_seconds', view, timer.phases['db'])
+        observe('template_seconds', view, timer.phases['template'])
+        observe('db_queries', view, len(timer.queries))
+        if total >= settings.METRICS_SLOW_REQUEST:
+            _log_slow(request, view, timer, total)
+        _maybe_flush()
+        return response
+
+
+class ServerTimingMiddleware:
+    '''Заголовок Server-Timing для ответов приложений
+    SERVER_TIMING_APPS. Сотрудник может включить или выключить его
+    для отдельного запроса заголовком X-Server-Timing: 1 или 0.'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        timer = current()
+        if timer is not None and self.enabled(request):
+            response['Server-Timing'] = self.header(timer)
+        return response
+
+    def enabled(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if not match or match.app_name not in settings.SERVER_TIMING_APPS:
+            return False
+        toggle = request.META.get('HTTP_X_SERVER_TIMING')
+        # Пользователь загружается только для запросов с переключателем.
+        if toggle in ('0', '1') and request.user.is_staff:
+            return toggle == '1'
+        return settings.SERVER_TIMING
+
+    def header(self, timer):
+        # Заголовок только в latin-1, поэтому описание - число запросов.
+        metrics = [f'{name};dur={timer.phases[name] * 1000:.1f}'
+                   for name in SERVER_TIMING_PHASES]
+        metrics[0] += f';desc="{len(timer.queries)} SQL"'
+        metrics.append(f'total;dur={timer.total * 1000:.1f}')
+        return ', '.join(metrics)
@@ -0,0 +1,87 @@
+# core/queries.py
+'''Запросы к базе вместе со строкой шаблона, из которой они вызваны.
+
+QueryLog записывает каждый запрос ко всем базам и место в шаблоне
+(template_location), при отрисовке которого он выполнен; у запроса
+из кода вьюхи места нет. Один и тот же SQL, повторённый с одной
+строки шаблона, - признак N+1: шаблон перебирает объекты и лениво
+догружает к каждому связанные. Такие запросы собирает lazy_loads.
+'''
+import inspect
+from collections import Counter, namedtuple
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template.base import Node, TokenType
+
+Query = namedtuple('Query', ('sql', 'location'))
+
+
+@contextmanager
+def watch_queries(handler):
+    '''Пропускает каждый запрос ко всем базам через handler.'''
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(handler))
+        yield
+
+
+def _tag(token):
+    if token.token_type == TokenType.VAR:
+        return f'{{{{ {token.contents} }}}}'
+    return f'{{% {token.contents} %}}'
+
+
+def template_location():
+    '''Строка шаблона, который сейчас отрисовывается, в виде
+    "posts/index.html:12 {{ post.author }}", или None вне шаблона.'''
+    frame = inspect.currentframe()
+    try:
+        # Ближайший к запросу узел шаблона - самый вложенный.
+        while frame is not None:
+            node = frame.f_locals.get('self')
+            if (frame.f_code.co_name == 'render_annotated'
+                    and isinstance(node, Node)
+                    and getattr(node, 'token', None) is not None):
+                return (f'{node.origin.template_name}:'
+                        f'{node.token.lineno} {_tag(node.token)}')
+            frame = frame.f_back
+        return None
+    finally:
+        del frame
+
+
+class QueryLog:
+    '''Обработчик для watch_queries, записывающий запросы.'''
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(Query(sql, template_location()))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def lazy_loads(self):
+        '''(место в шаблоне, SQL) -> число повторов для запросов,
+        выполненных с одной строки шаблона больше одного раза.'''
+        counts = Counter(query[::-1] for query in self.queries
+                         if query.location)
+        return {key: count for key, count in counts.items() if count > 1}
+
+    def report(self):
+        '''Все запросы по порядку с местом в шаблоне.'''
+        return '\n'.join(
+            f'{index}. {query.location or "вьюха"}: {query.sql}'
+            for index, query in enumerate(self.queries, 1)
+        )
+
+
+@contextmanager
+def capture_queries():
+    '''Записывает запросы блока ко всем базам в QueryLog.'''
+    log = QueryLog()
+    with watch_queries(log):
+        yield log
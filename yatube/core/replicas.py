@@ -0,0 +1,77 @@
+# core/replicas.py
+'''Чтение ленты, профиля и поста с реплик базы.
+
+ReplicaMiddleware выбирает для запроса одну реплику из
+DATABASE_REPLICAS, если вызвана одна из вьюх DATABASE_REPLICA_VIEWS,
+и ReplicaRouter отправляет на неё чтение. Запись и всё остальное
+чтение идёт на основную базу default.
+
+Реплика отстаёт от основной базы, поэтому пишущий пользователь
+какое-то время читает только с основной: запрос, в котором была
+запись, ставит куку DATABASE_STICKY_COOKIE на DATABASE_STICKY_SECONDS
+секунд, и запросы с этой кукой на реплику не ходят. Куку ставят
+только POST и другие небезопасные запросы: get_or_create при чтении
+страницы пользователя к основной базе не привязывает. После записи
+(или get_or_create) в том же запросе чтение идёт на основную базу.
+'''
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def _replica():
+    if getattr(_state, 'wrote', False):
+        return None
+    return getattr(_state, 'replica', None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in settings.DATABASE_PRIMARY_APPS:
+            return None
+        return _replica()
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему репликацией.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica = None
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            if _state.wrote and request.method not in SAFE_METHODS:
+                response.set_cookie(settings.DATABASE_STICKY_COOKIE, '1',
+                                    max_age=settings.DATABASE_STICKY_SECONDS,
+                                    httponly=True, samesite='Lax')
+            return response
+        finally:
+            _state.replica = None
+            _state.wrote = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.DATABASE_REPLICAS
+                and request.method in SAFE_METHODS
+                and request.resolver_match.view_name
+                in settings.DATABASE_REPLICA_VIEWS
+                and settings.DATABASE_STICKY_COOKIE not in request.COOKIES):
+            _state.replica = random.choice(settings.DATABASE_REPLICAS)
@@ -0,0 +1,173 @@
+# core/staticfiles.py
+'''Статика с хешем содержимого в имени и сжатыми копиями.
+
+collectstatic с CompressedManifestStaticFilesStorage записывает
+в STATIC_ROOT копии файлов с хешем содержимого в имени
+(css/bootstrap.min.<хеш>.css), а рядом с ними - сжатые варианты
+.gz и, если установлен пакет brotli, .br. Тег {% static %} выдаёт
+имена с хешем, поэтому такие файлы можно кэшировать навсегда.
+
+Когда перед приложением нет прокси, который раздаёт STATIC_ROOT,
+StaticFilesApplication (SERVE_STATIC = True в yatube/wsgi.py) отдаёт
+статику сама: выбирает сжатый вариант по Accept-Encoding, а файлам
+с хешем в имени ставит Cache-Control с immutable.
+'''
+import gzip
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (ManifestStaticFilesStorage,
+                                                StaticFilesStorage)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content-Encoding -> расширение сжатой копии, в порядке предпочтения.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+CACHE_FOREVER = 'public, max-age=31536000, immutable'
+
+
+def _compressors():
+    compressors = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        compressors.insert(0, ('.br', brotli.compress))
+    return compressors
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def url(self, name, force=False):
+        # Файла нет в манифесте (разработка, тесты без collectstatic):
+        # ссылка ведёт на файл без хеша, сам файл не открывается.
+        try:
+            return super().url(name, force)
+        except ValueError:
+            return StaticFilesStorage.url(self, name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Только итоговые имена из манифеста: файлы со ссылками на
+        # другие файлы проходят несколько раз, и промежуточные имена
+        # тоже попадают в STATIC_ROOT, но на них никто не ссылается.
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            self.compress(hashed_name)
+
+    def compress(self, name):
+        '''Записывает рядом с name сжатые копии, если файл подходит
+        по расширению и сжатие действительно уменьшает его.'''
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in settings.STATIC_COMPRESS_EXTENSIONS:
+            return
+        path = self.path(name)
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < settings.STATIC_COMPRESS_MIN_SIZE:
+            return
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as file:
+                    file.write(compressed)
+
+
+def accepted_encodings(header):
+    '''Кодировки из Accept-Encoding, не запрещённые через q=0.'''
+    accepted = set()
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+class StaticFilesApplication:
+    '''WSGI-обёртка, которая отдаёт файлы STATIC_ROOT по STATIC_URL,
+    а остальные запросы передаёт application. Список файлов
+    составляется один раз при запуске, после collectstatic.'''
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = root or settings.STATIC_ROOT
+        self.prefix = prefix or settings.STATIC_URL
+        self.files = self.scan()
+
+    def hashed_names(self):
+        manifest = os.path.join(
+            self.root, ManifestStaticFilesStorage.manifest_name)
+        try:
+            with open(manifest, encoding='utf-8') as file:
+                return set(json.load(file).get('paths', {}).values())
+        except (OSError, ValueError):
+            return set()
+
+    def scan(self):
+        hashed = self.hashed_names()
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        files = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                if name.endswith(suffixes):
+                    continue
+                url = os.path.relpath(path, self.root).replace(os.sep, '/')
+                content_type, _ = mimetypes.guess_type(name)
+                files[url] = {
+                    'path': path,
+                    'content_type': (content_type
+                                     or 'application/octet-stream'),
+                    'cache_control': (CACHE_FOREVER if url in hashed else
+                                      'public, max-age=%d'
+                                      % settings.STATIC_MAX_AGE),
+                    'last_modified': formatdate(os.path.getmtime(path),
+                                                usegmt=True),
+                    'encodings': [(coding, path + suffix)
+                                  for coding, suffix in ENCODINGS
+                                  if os.path.exists(path + suffix)],
+                }
+        return files
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        method = environ.get('REQUEST_METHOD')
+        static = (path.startswith(self.prefix)
+                  and self.files.get(path[len(self.prefix):]))
+        if not static or method not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+        return self.serve(static, environ, start_response)
+
+    def serve(self, static, environ, start_response):
+        accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        path = static['path']
+        headers = [
+            ('Content-Type', static['content_type']),
+            ('Cache-Control', static['cache_control']),
+            ('Last-Modified', static['last_modified']),
+        ]
+        if static['encodings']:
+            headers.append(('Vary', 'Accept-Encoding'))
+        for coding, encoded_path in static['encodings']:
+            if coding in accepted:
+                path = encoded_path
+                headers.append(('Content-Encoding', coding))
+                break
+        headers.append(('Content-Length', str(os.path.getsize(path))))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(path, 'rb'))
@@ -0,0 +1,33 @@
+# core/testing.py
+'''Настройки, с которыми идут тесты.
+
+Тесты выполняются в одном процессе и без memcached, поэтому кэш
+локальный. Картинки обрабатываются и миниатюры создаются сразу
+в запросе: фоновый пул писал бы в базу, пока тест с transaction=True
+очищает таблицы ("database table is locked"). TestRunner (TEST_RUNNER)
+включает TEST_SETTINGS для manage.py test, фикстура tests/conftest.py -
+для pytest.
+'''
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_SETTINGS = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    },
+    'IMAGE_PROCESS_WORKERS': 0,
+    'THUMBNAIL_WORKERS': 0,
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**TEST_SETTINGS)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,134 @@
+# core/tests/test_metrics.py
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import User
+
+from .. import metrics
+
+CON = {
+    'METRICS_URL': '/metrics/',
+    'USER_NAME': 'user',
+    'TOKEN': 'secret-token',
+    'HISTOGRAMS': ('yatube_request_seconds', 'yatube_db_seconds',
+                   'yatube_template_seconds', 'yatube_db_queries'),
+    'PHASES': ('db', 'cache', 'thumbnail', 'template', 'total'),
+}
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=0, METRICS_TOKEN=CON['TOKEN'])
+class MetricsTests(TestCase):
+    def setUp(self):
+        # Замеры прежних тестов не должны попасть в эти.
+        metrics.flush()
+        cache.clear()
+        self.client = Client()
+
+    def get_metrics(self, token=CON['TOKEN'], **extra):
+        if token is not None:
+            extra['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        return self.client.get(CON['METRICS_URL'], **extra)
+
+    def test_views_are_measured(self):
+        '''После запросов к вьюхам /metrics/ отдаёт по ним гистограммы
+        времени и числа SQL-запросов.'''
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        self.client.get(reverse('about:author'))
+        response = self.get_metrics()
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        for name in CON['HISTOGRAMS']:
+            with self.subTest(name=name):
+                self.assertIn(f'# TYPE {name} histogram', text)
+                self.assertIn(f'{name}_count{{view="posts:index"}} 2', text)
+                self.assertIn(f'{name}_bucket{{view="posts:index",'
+                              f'le="+Inf"}} 2', text)
+        self.assertIn('view="about:author"', text)
+        self.assertNotIn('view="posts:profile"', text)
+
+    def test_flush_runs_in_background(self):
+        '''Замеры сбрасываются в кэш не в потоке запроса.'''
+        threads = []
+
+        def flush():
+            threads.append(threading.current_thread())
+
+        with mock.patch.object(metrics, 'flush', side_effect=flush):
+            self.client.get(reverse('posts:index'))
+            for thread in threading.enumerate():
+                if thread.name == 'metrics-flush':
+                    thread.join()
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_slow_requests_are_logged(self):
+        '''Медленный запрос попадает в журнал с разбивкой по SQL.'''
+        with override_settings(METRICS_SLOW_REQUEST=0), \
+                self.assertLogs('core.metrics', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_metrics_are_private(self):
+        '''Метрики видят сотрудники и запросы с верным токеном;
+        адрес, даже локальный, по умолчанию доступа не даёт.'''
+        for token in (None, '', 'wrong'):
+            with self.subTest(token=token):
+                self.assertEqual(self.get_metrics(token).status_code, 404)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.get_metrics('').status_code, 404)
+        self.assertEqual(self.get_metrics().status_code, 200)
+        with override_settings(METRICS_ALLOWED_IPS=('127.0.0.1',)):
+            self.assertEqual(self.get_metrics(None).status_code, 200)
+        staff = User.objects.create_user(username=CON['USER_NAME'],
+                                         is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.get_metrics(None).status_code, 200)
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username=CON['USER_NAME'],
+                                             is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def phases(self, response):
+        return {item.split(';')[0]: item
+                for item in response['Server-Timing'].split(', ')}
+
+    def test_header_lists_phases(self):
+        '''Ответы posts, users и about несут Server-Timing с фазами
+        база, кэш, миниатюры, шаблоны; остальные - нет.'''
+        urls = (reverse('posts:index'), reverse('users:signup'),
+                reverse('about:tech'))
+        for url in urls:
+            with self.subTest(url=url):
+                phases = self.phases(self.client.get(url))
+                self.assertEqual(set(phases), set(CON['PHASES']))
+        phases = self.phases(self.client.get(reverse('posts:index')))
+        self.assertIn('SQL"', phases['db'])
+        self.assertNotIn('Server-Timing', self.client.get(CON['METRICS_URL']))
+
+    def test_staff_toggle(self):
+        '''Сотрудник выключает и включает заголовок для запроса,
+        для остальных переключатель не действует.'''
+        url = reverse('posts:index')
+        response = self.client.get(url, HTTP_X_SERVER_TIMING='0')
+        self.assertIn('Server-Timing', response)
+        self.client.force_login(self.staff)
+        response = self.client.get(url, HTTP_X_SERVER_TIMING='0')
+        self.assertNotIn('Server-Timing', response)
+        with override_settings(SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get(url))
+            response = self.client.get(url, HTTP_X_SERVER_TIMING='1')
+            self.assertIn('Server-Timing', response)
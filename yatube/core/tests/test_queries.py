@@ -0,0 +1,140 @@
+# core/tests/test_queries.py
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template import Context, Template
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+from ..metrics import view_names
+from ..queries import capture_queries
+
+# CON - CONSTANTS
+CON = {
+    # Малый набор - по одному объекту; большой - больше страницы
+    # ленты и страницы комментариев.
+    'SIZES': (1, max(settings.POSTS_PER_PAGE,
+                     settings.COMMENTS_PER_PAGE) + 1),
+    'READER_NAME': 'reader',
+    'STAR_NAME': 'star',
+    'GROUP_SLUG': 'test-slug',
+    'QUERY': 'запись',
+    'COMMENT_TEXT': 'Новый комментарий',
+}
+# Имя вьюхи -> (аргументы, метод, данные формы, бюджет для анонима,
+# бюджет для вошедшего пользователя). Бюджеты - точные текущие числа
+# запросов: уменьшив число запросов, уменьшите и бюджет.
+URLS = {
+    'posts:index': ((), 'get', None, 2, 4),
+    'posts:group_list': (('group',), 'get', None, 4, 6),
+    'posts:profile': (('star',), 'get', None, 5, 8),
+    'posts:post_detail': (('post',), 'get', None, 3, 5),
+    'posts:post_comments': (('post',), 'get', None, 1, 1),
+    'posts:search': ((), 'get', {'q': CON['QUERY']}, 2, 4),
+    'posts:follow_index': ((), 'get', None, 0, 5),
+    'posts:post_create': ((), 'get', None, 0, 5),
+    'posts:post_edit': (('own_post',), 'get', None, 0, 7),
+    'posts:add_comment': (('post',), 'post',
+                          {'text': CON['COMMENT_TEXT']}, 0, 7),
+    'posts:profile_follow': (('star',), 'get', None, 0, 6),
+    'posts:profile_unfollow': (('star',), 'get', None, 0, 10),
+    'users:signup': ((), 'get', None, 0, 2),
+    'users:login': ((), 'get', None, 0, 2),
+    'users:logout': ((), 'get', None, 0, 4),
+    'about:author': ((), 'get', None, 0, 2),
+    'about:tech': ((), 'get', None, 0, 2),
+}
+
+
+class QueryBudgetTests(TestCase):
+    '''Число запросов каждой страницы posts, users и about не больше
+    бюджета и одинаково на малом и большом наборе данных.'''
+
+    def create_dataset(self, size):
+        '''Читатель подписан на size авторов; у звезды size постов,
+        у её последнего поста size комментариев разных авторов.'''
+        reader = User.objects.create_user(username=CON['READER_NAME'])
+        star = User.objects.create_user(username=CON['STAR_NAME'])
+        authors = [star] + [User.objects.create_user(username=f'author_{i}')
+                            for i in range(1, size)]
+        group = Group.objects.create(title='Сообщество',
+                                     slug=CON['GROUP_SLUG'])
+        for author in authors:
+            Follow.objects.create(user=reader, author=author)
+            Post.objects.create(author=author, group=group,
+                                text=f'Запись автора {author.username}')
+        for i in range(1, size):
+            Post.objects.create(author=star, group=group,
+                                text=f'Запись звезды {i}')
+        post = Post.objects.filter(author=star).latest('pub_date')
+        for author in authors:
+            Comment.objects.create(post=post, author=author,
+                                   text='Комментарий')
+        own_post = Post.objects.create(author=reader, text='Своя запись')
+        return reader, {'group': group.slug, 'star': star.username,
+                        'post': post.pk, 'own_post': own_post.pk}
+
+    def measure(self, user, name, args, method, data):
+        '''Запросы одного обращения к странице; изменения в базе
+        откатываются.'''
+        cache.clear()
+        client = Client()
+        if user:
+            client.force_login(user)
+        with transaction.atomic():
+            with capture_queries() as log:
+                response = getattr(client, method)(
+                    reverse(name, args=args), data)
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, name)
+        return log
+
+    def measure_all(self, size):
+        logs = {}
+        with transaction.atomic():
+            reader, targets = self.create_dataset(size)
+            for name, (args, method, data, *_) in URLS.items():
+                args = [targets[arg] for arg in args]
+                for user in (None, reader):
+                    logs[name, bool(user)] = self.measure(
+                        user, name, args, method, data)
+            transaction.set_rollback(True)
+        return logs
+
+    def test_queries_within_budget_and_constant(self):
+        small, large = (self.measure_all(size) for size in CON['SIZES'])
+        for (name, logged_in), log in large.items():
+            budget = URLS[name][3 + logged_in]
+            with self.subTest(view=name, logged_in=logged_in):
+                self.assertEqual(log.lazy_loads(), {},
+                                 f'N+1 в шаблоне:\n{log.report()}')
+                self.assertEqual(len(log), len(small[name, logged_in]),
+                                 f'Запросы растут с данными:\n'
+                                 f'{log.report()}')
+                self.assertLessEqual(len(log), budget,
+                                     f'Бюджет {budget}:\n{log.report()}')
+
+    def test_every_view_has_budget(self):
+        '''Новая страница в posts, users или about требует бюджета.'''
+        names = {name for name in view_names()
+                 if name.split(':')[0] in ('posts', 'users', 'about')}
+        self.assertEqual(names, set(URLS))
+
+
+class LazyLoadDetectorTests(TestCase):
+    def test_reports_template_line(self):
+        '''Ленивая загрузка в цикле шаблона - N+1 со строкой шаблона.'''
+        author = User.objects.create_user(username=CON['STAR_NAME'])
+        for i in range(3):
+            Post.objects.create(author=author, text=f'Запись {i}')
+        template = Template('{% for post in posts %}\n'
+                            '{{ post.author.username }}\n'
+                            '{% endfor %}')
+        with capture_queries() as log:
+            template.render(Context({'posts': Post.objects.all()}))
+        (location, sql), count = next(iter(log.lazy_loads().items()))
+        self.assertEqual(count, 3)
+        self.assertTrue(location.endswith(':2 {{ post.author.username }}'))
+        self.assertIn('auth_user', sql)
@@ -0,0 +1,78 @@
+# core/tests/test_replicas.py
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..replicas import ReplicaRouter
+
+CON = {
+    'REPLICA': 'replica',
+    'USER_NAME': 'author',
+    'POST_TEXT': 'Свежий пост',
+}
+
+
+@override_settings(DATABASE_REPLICAS=[CON['REPLICA']])
+class ReplicaRoutingTests(TransactionTestCase):
+    '''Реплика - второе соединение с той же тестовой базой, поэтому
+    видно, какие запросы ушли на неё.'''
+    databases = {'default', CON['REPLICA']}
+
+    @classmethod
+    def setUpClass(cls):
+        connections.databases[CON['REPLICA']] = dict(
+            connections.databases['default'])
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[CON['REPLICA']].close()
+        del connections.databases[CON['REPLICA']]
+        delattr(connections._connections, CON['REPLICA'])
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=CON['USER_NAME'])
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connections[CON['REPLICA']]) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_feeds_read_from_replica(self):
+        '''Лента, профиль и пост читаются с реплики, остальные
+        страницы - с основной базы.'''
+        post = Post.objects.create(author=self.user, text=CON['POST_TEXT'])
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertGreater(self.get(url)[1], 0)
+        self.assertEqual(self.get(reverse('posts:post_create'))[1], 0)
+
+    def test_author_reads_primary_after_write(self):
+        '''После записи автор читает с основной базы и видит свой пост.'''
+        response = self.client.post(reverse('posts:post_create'),
+                                    data={'text': CON['POST_TEXT']})
+        self.assertIn(settings.DATABASE_STICKY_COOKIE, response.cookies)
+        response, replica_queries = self.get(reverse('posts:index'))
+        self.assertEqual(replica_queries, 0)
+        self.assertContains(response, CON['POST_TEXT'])
+
+    def test_replicas_are_not_migrated(self):
+        '''Схему реплики получают репликацией, а не миграциями.'''
+        router = ReplicaRouter()
+        self.assertFalse(router.allow_migrate(CON['REPLICA'], 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
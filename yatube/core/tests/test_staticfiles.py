@@ -0,0 +1,121 @@
+# core/tests/test_staticfiles.py
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from ..staticfiles import CACHE_FOREVER, StaticFilesApplication
+
+CON = {
+    'CSS_NAME': 'css/site.css',
+    'CSS': b'body { color: black; }\n' * 100,
+    # Цепочка ссылок base -> layout -> site: на первом проходе base
+    # получает промежуточное имя со старым хешем layout.
+    'IMPORT_NAME': 'css/base.css',
+    'IMPORT': b'@import url("layout.css");\n' + b'a { margin: 0; }\n' * 100,
+    'LAYOUT_NAME': 'css/layout.css',
+    'LAYOUT': b'@import url("site.css");\n' + b'p { margin: 0; }\n' * 100,
+    'STATIC_URL': '/static/',
+}
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SOURCE_DIR = os.path.join(TEMP_DIR, 'source')
+STATIC_ROOT = os.path.join(TEMP_DIR, 'root')
+
+
+def fallback(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'django']
+
+
+@override_settings(STATICFILES_DIRS=[SOURCE_DIR], STATIC_ROOT=STATIC_ROOT,
+                   STATIC_URL=CON['STATIC_URL'], INSTALLED_APPS=[
+                       'django.contrib.staticfiles'])
+class StaticFilesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(SOURCE_DIR, 'css'))
+        for name, content in ((CON['CSS_NAME'], CON['CSS']),
+                              (CON['LAYOUT_NAME'], CON['LAYOUT']),
+                              (CON['IMPORT_NAME'], CON['IMPORT'])):
+            with open(os.path.join(SOURCE_DIR, name), 'wb') as file:
+                file.write(content)
+        call_command('collectstatic', interactive=False, verbosity=0,
+                     stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def request(self, url, **environ):
+        application = StaticFilesApplication(fallback)
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        body = application({'PATH_INFO': url, 'REQUEST_METHOD': 'GET',
+                            **environ}, start_response)
+        response['body'] = b''.join(body)
+        if hasattr(body, 'close'):
+            body.close()
+        return response
+
+    def test_collectstatic_writes_hashed_compressed_files(self):
+        '''collectstatic пишет файл с хешем в имени и сжатую копию,
+        {% static %} ссылается на файл с хешем.'''
+        hashed_name = staticfiles_storage.stored_name(CON['CSS_NAME'])
+        self.assertNotEqual(hashed_name, CON['CSS_NAME'])
+        path = staticfiles_storage.path(hashed_name)
+        with gzip.open(path + '.gz') as file:
+            self.assertEqual(file.read(), CON['CSS'])
+        html = Template('{% load static %}{% static "css/site.css" %}'
+                        ).render(Context())
+        self.assertEqual(html, CON['STATIC_URL'] + hashed_name)
+
+    def test_only_final_names_are_compressed(self):
+        '''Сжатые копии есть только у итоговых имён из манифеста,
+        промежуточные имена цепочки ссылок не сжимаются.'''
+        final = set(staticfiles_storage.load_manifest().values())
+        compressed = {
+            os.path.relpath(os.path.join(directory, name)[:-len('.gz')],
+                            STATIC_ROOT).replace(os.sep, '/')
+            for directory, _, names in os.walk(STATIC_ROOT)
+            for name in names if name.endswith('.gz')
+        }
+        self.assertIn(staticfiles_storage.stored_name(CON['IMPORT_NAME']),
+                      compressed)
+        self.assertLessEqual(compressed, final)
+
+    def test_hashed_file_is_served_compressed_and_immutable(self):
+        '''Файл с хешем отдаётся сжатым по Accept-Encoding
+        и кэшируется навсегда.'''
+        url = staticfiles_storage.url(CON['CSS_NAME'])
+        response = self.request(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        headers = response['headers']
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(headers['Cache-Control'], CACHE_FOREVER)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(headers['Content-Type'], 'text/css')
+        self.assertEqual(gzip.decompress(response['body']), CON['CSS'])
+
+    def test_plain_and_unknown_files(self):
+        '''Без Accept-Encoding файл отдаётся как есть; у файла без хеша
+        короткий срок кэша; неизвестный путь уходит в приложение.'''
+        response = self.request(CON['STATIC_URL'] + CON['CSS_NAME'])
+        self.assertEqual(response['body'], CON['CSS'])
+        self.assertNotIn('Content-Encoding', response['headers'])
+        self.assertNotIn('immutable', response['headers']['Cache-Control'])
+        response = self.request(CON['STATIC_URL'] + 'missing.css')
+        self.assertEqual(response['body'], b'django')
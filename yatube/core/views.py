@@ -1,6 +1,12 @@
 # core/views.py
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics as request_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -16,3 +22,26 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics_allowed(request):
+    '''Сотрудник, верный токен METRICS_TOKEN или адрес из
+    METRICS_ALLOWED_IPS (только без прокси перед приложением).'''
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    scheme, _, credentials = request.META.get(
+        'HTTP_AUTHORIZATION', '').partition(' ')
+    if (token and scheme.lower() == 'bearer'
+            and hmac.compare_digest(credentials.encode(), token.encode())):
+        return True
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    '''Метрики вьюх всех процессов в формате Prometheus.'''
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(request_metrics.render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
@@ -2,15 +2,27 @@ from django.conf import settings
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import search
+
+
+class FullTextSearchMixin:
+    '''Поиск в списке объектов по полнотекстовому индексу
+    (posts/search.py) вместо ILIKE по search_fields.'''
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        matches = search(self.model, search_term).values('pk')
+        return queryset.filter(pk__in=matches), False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     '''Источник конфигурации модели Post, регистрируемой в админке, позволяет:
     - отображать в админке первичный ключ, текст, дату публикации, автора и
     сообщество (группу) каждой записи;
     - редактировать поле сообщества (группы);
-    - проводить поиск по тексту;
+    - проводить полнотекстовый поиск по тексту;
     - фильттровать по дате публицкации;
     - выводить "-пусто-" в полях со значением None.'''
     list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image')
@@ -21,12 +33,12 @@ class PostAdmin(admin.ModelAdmin):
 
 
 @admin.register(Group)
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(FullTextSearchMixin, admin.ModelAdmin):
     '''Источник конфигурации модели Group, регистрируемой в админке, позволяет:
     - отображать в админке первичный ключ, название сообщества, ссылку и
     описание сообщества;
     - редактировать название и описание сообщества;
-    - проводить поиск по названию сообщества;
+    - проводить полнотекстовый поиск по названию сообщества;
     - выводить "-пусто-" в полях со значением None.'''
     list_display = ('pk', 'title', 'slug', 'description',)
     list_editable = ('title', 'description')
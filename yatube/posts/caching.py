@@ -0,0 +1,200 @@
+# posts/caching.py
+'''Кэш главной страницы и ленты подписок с инвалидацией по версиям.
+
+Готовые ответы лежат в общем кэше (CACHES['default']) под ключом,
+в который входят номера версий. Запись увеличивает версию, и старые
+ответы перестают находиться без перебора и удаления ключей, а сами
+истекают по времени жизни. Версия увеличивается сразу при записи и
+ещё раз после фиксации транзакции: так читатель, успевший между ними
+сохранить в кэш старую выборку, не оставит её под новой версией.
+Автор получает свой пост сразу (read-your-writes): версия меняется
+до того, как представление отправит его на следующую страницу.
+
+Главная зависит от одной версии всех постов. Лента подписок зависит
+от версии подписок читателя и от версий каждого автора, на которого
+он подписан: публикация увеличивает только версию автора (O(1) при
+любом числе подписчиков), а читатель получает версии своих авторов
+одним запросом get_many. У каждого сообщества своя версия для ETag
+его страницы (posts/etags.py).
+
+Имена пользователей и названия сообществ выводятся на чужих
+страницах, поэтому их правка увеличивает версии всех страниц,
+где они видны. Такие правки редки, и лишний проход по постам
+автора или сообщества при них допустим.
+'''
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Comment, Follow, Post
+
+INDEX_VERSION_KEY = 'posts:index:version'
+AUTHOR_VERSION_KEY = 'posts:author:{}:version'
+FOLLOWS_VERSION_KEY = 'posts:follows:{}:version'
+GROUP_VERSION_KEY = 'posts:group:{}:version'
+FOLLOWED_AUTHORS_KEY = 'posts:follows:{}:{}:authors'
+
+
+def _new_series():
+    # Если ключ версии вытеснен из кэша, новая серия начинается
+    # с текущего времени и не совпадёт с оставшимися ключами страниц.
+    return int(time.time() * 1000)
+
+
+def versions(keys):
+    '''Текущие версии по ключам; отсутствующие начинают новую серию.'''
+    found = cache.get_many(keys)
+    missing = {key: _new_series() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+    return {**found, **missing}
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_series(), None)
+
+
+def bump(key):
+    '''Увеличивает версию сейчас и после фиксации транзакции.'''
+    _incr(key)
+    transaction.on_commit(lambda: _incr(key))
+
+
+def bump_index_version():
+    '''Инвалидирует все закэшированные страницы главной.'''
+    bump(INDEX_VERSION_KEY)
+
+
+def bump_author_version(author_id):
+    '''Инвалидирует ленты подписок всех подписчиков автора.'''
+    bump(AUTHOR_VERSION_KEY.format(author_id))
+
+
+def bump_follows_version(user_id):
+    '''Инвалидирует ленту подписок пользователя после (от)подписки.'''
+    bump(FOLLOWS_VERSION_KEY.format(user_id))
+
+
+def bump_group_version(group_id):
+    '''Меняет ETag страниц сообщества; пост без сообщества -
+    ничего не делает.'''
+    if group_id is not None:
+        bump(GROUP_VERSION_KEY.format(group_id))
+
+
+def bump_image_version(name):
+    '''Миниатюры картинки name готовы: страницы с её постами
+    выводили заглушку и должны отрисоваться заново.'''
+    posts = (Post.objects.filter(image=name)
+             .values_list('author_id', 'group_id').distinct())
+    for author_id, group_id in posts:
+        bump_author_version(author_id)
+        bump_group_version(group_id)
+    if posts:
+        bump_index_version()
+
+
+def bump_user_display_version(user_id):
+    '''Имя пользователя изменилось: оно выводится на главной,
+    в его профиле и ленте, в сообществах с его постами и на
+    страницах постов, которые он комментировал.'''
+    bump_index_version()
+    commented = (Comment.objects.filter(author_id=user_id)
+                 .values_list('post__author_id', flat=True).distinct())
+    for author_id in {user_id, *commented}:
+        bump_author_version(author_id)
+    groups = (Post.objects.filter(author_id=user_id)
+              .values_list('group_id', flat=True).distinct())
+    for group_id in groups:
+        bump_group_version(group_id)
+
+
+def bump_group_display_version(group_id):
+    '''Название, адрес или описание сообщества изменились: они
+    выводятся на его странице, в карточках и на страницах его
+    постов.'''
+    bump_index_version()
+    bump_group_version(group_id)
+    authors = (Post.objects.filter(group_id=group_id)
+               .values_list('author_id', flat=True).distinct())
+    for author_id in authors:
+        bump_author_version(author_id)
+
+
+def _path_hash(request):
+    return hashlib.md5(request.get_full_path().encode()).hexdigest()
+
+
+def index_cache_key(request):
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    version = versions([INDEX_VERSION_KEY])[INDEX_VERSION_KEY]
+    return f'posts:index:{version}:{user_id}:{_path_hash(request)}'
+
+
+def followed_authors(user_id, follows_version):
+    '''Список авторов читателя, закэшированный до смены его подписок.'''
+    key = FOLLOWED_AUTHORS_KEY.format(user_id, follows_version)
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = sorted(Follow.objects.filter(user_id=user_id)
+                            .values_list('author_id', flat=True))
+        cache.set(key, author_ids, settings.FOLLOW_CACHE_TIME)
+    return author_ids
+
+
+def follow_cache_key(request):
+    user_id = request.user.pk
+    follows_key = FOLLOWS_VERSION_KEY.format(user_id)
+    follows_version = versions([follows_key])[follows_key]
+    author_keys = [AUTHOR_VERSION_KEY.format(author_id)
+                   for author_id in followed_authors(user_id,
+                                                     follows_version)]
+    author_versions = versions(author_keys)
+    digest = hashlib.md5(','.join(
+        str(author_versions[key]) for key in author_keys
+    ).encode()).hexdigest()
+    return (f'posts:follow:{user_id}:{follows_version}:{digest}:'
+            f'{_path_hash(request)}')
+
+
+def _cached(view, make_key, timeout, cacheable=lambda request: True):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD')
+                or not cacheable(request)):
+            return view(request, *args, **kwargs)
+        key = make_key(request)
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response, timeout)
+        return response
+    return wrapper
+
+
+def cache_index(view):
+    '''Кэширует GET-ответы главной страницы на INDEX_CACHE_TIME секунд
+    в разрезе версии ленты, пользователя и адреса с параметрами.'''
+    return _cached(view, index_cache_key, settings.INDEX_CACHE_TIME)
+
+
+def _first_follow_pages(request):
+    if any(param in request.GET for param in ('after', 'before')):
+        return False
+    page = request.GET.get('page', '1')
+    return page.isdigit() and int(page) <= settings.FOLLOW_CACHE_PAGES
+
+
+def cache_follow_feed(view):
+    '''Кэширует первые FOLLOW_CACHE_PAGES страниц ленты подписок
+    отдельно для каждого читателя.'''
+    return _cached(view, follow_cache_key, settings.FOLLOW_CACHE_TIME,
+                   _first_follow_pages)
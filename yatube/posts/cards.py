@@ -0,0 +1,62 @@
+# posts/cards.py
+'''Кэш карточек постов в лентах.
+
+Карточка поста (posts/includes/post_card.html) одна для главной,
+ленты подписок, профиля, сообщества и поиска и не зависит от читателя.
+Готовый HTML карточки лежит в общем кэше под ключом из pk поста
+и его версии - хеша всего, что выводит карточка: текста, даты,
+картинки, автора и сообщества. Правка поста, имени автора или
+сообщества меняет ключ, старая карточка перестаёт находиться
+и истекает по CARD_CACHE_TIME.
+
+Страница получает карточки всех своих постов одним get_many,
+отрисовывает только промахи и сохраняет их одним set_many. Карточки
+с ещё не готовыми миниатюрами не кэшируются: иначе заглушка вместо
+картинки осталась бы в кэше.
+'''
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from . import thumbnails
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+# Увеличить при изменении шаблона карточки.
+CARD_TEMPLATE_VERSION = 1
+CARD_KEY = 'posts:card:{}:{}'
+
+
+def card_version(post):
+    '''Хеш всего, что выводит карточка поста.'''
+    group = post.group
+    parts = (
+        CARD_TEMPLATE_VERSION, post.text_html, post.pub_date.isoformat(),
+        post.image.name, post.author.username, post.author.get_full_name(),
+        group.slug if group else '',
+    )
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def render_card(post):
+    return render_to_string(CARD_TEMPLATE, {'post': post})
+
+
+def attach(posts):
+    '''Кладёт в post.card готовую карточку каждого поста: из кэша
+    или отрисованную заново.'''
+    keys = {post.pk: CARD_KEY.format(post.pk, card_version(post))
+            for post in posts}
+    found = cache.get_many(list(keys.values()))
+    rendered = {}
+    for post in posts:
+        key = keys[post.pk]
+        if key in found:
+            post.card = found[key]
+            continue
+        post.card = render_card(post)
+        if not post.image or thumbnails.is_ready(post.image):
+            rendered[key] = post.card
+    if rendered:
+        cache.set_many(rendered, settings.CARD_CACHE_TIME)
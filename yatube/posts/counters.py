@@ -0,0 +1,119 @@
+# posts/counters.py
+'''Денормализованные счётчики: записи автора и сообщества, комментарии
+поста, подписчики и подписки пользователя.
+
+Счётчики меняются атомарным UPDATE ... SET x = x + 1 в той же
+транзакции, что и запись Post, Comment или Follow. Расхождения
+(например, после массовых операций в обход моделей) исправляет
+команда reconcile_counters.
+'''
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+USER_COUNTERS = ('posts_count', 'followers_count', 'following_count')
+
+
+def _bump(queryset, **deltas):
+    '''Сдвигает счётчики, не опуская их ниже нуля.
+    Возвращает число обновлённых строк.'''
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def bump_user(user_id, **deltas):
+    '''Строка счётчиков создаётся заново только для прибавления:
+    уменьшать в ней нечего, а при удалении пользователя его строка
+    уже удалена, и новая нарушила бы внешний ключ. Прочие пропуски
+    исправляет reconcile_counters.'''
+    if (not _bump(UserStats.objects.filter(user_id=user_id), **deltas)
+            and any(delta > 0 for delta in deltas.values())):
+        UserStats.objects.get_or_create(user_id=user_id)
+        _bump(UserStats.objects.filter(user_id=user_id), **deltas)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _bump(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def bump_post(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def user_stats(user):
+    '''Счётчики пользователя; строка создаётся при первом обращении.'''
+    stats, _ = UserStats.objects.get_or_create(user=user)
+    return stats
+
+
+def _grouped(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids}).order_by()
+        .values_list(field).annotate(Count('pk'))
+    )
+
+
+def _id_batches(queryset, batch_size):
+    '''Первичные ключи queryset пачками по batch_size, по возрастанию.'''
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_id).order_by('pk')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def reconcile_users(batch_size):
+    '''Пересчитывает счётчики пользователей; возвращает число
+    исправленных строк.'''
+    fixed = 0
+    for ids in _id_batches(User.objects.all(), batch_size):
+        actual = {
+            'posts_count': _grouped(Post.objects, 'author_id', ids),
+            'followers_count': _grouped(Follow.objects, 'author_id', ids),
+            'following_count': _grouped(Follow.objects, 'user_id', ids),
+        }
+        stats = UserStats.objects.in_bulk(ids)
+        missing = [UserStats(user_id=user_id) for user_id in ids
+                   if user_id not in stats]
+        UserStats.objects.bulk_create(missing)
+        drifted = []
+        for row in list(stats.values()) + missing:
+            values = {field: actual[field].get(row.user_id, 0)
+                      for field in USER_COUNTERS}
+            if any(getattr(row, field) != value
+                   for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(row, field, value)
+                drifted.append(row)
+        UserStats.objects.bulk_update(drifted, USER_COUNTERS)
+        fixed += len(drifted)
+    return fixed
+
+
+def _reconcile(model, field, related, fk, batch_size):
+    fixed = 0
+    for ids in _id_batches(model.objects.all(), batch_size):
+        actual = _grouped(related.objects, fk, ids)
+        drifted = []
+        for pk, value in model.objects.filter(pk__in=ids).values_list(
+                'pk', field):
+            if value != actual.get(pk, 0):
+                drifted.append(model(pk=pk, **{field: actual.get(pk, 0)}))
+        model.objects.bulk_update(drifted, (field,))
+        fixed += len(drifted)
+    return fixed
+
+
+def reconcile_posts(batch_size):
+    return _reconcile(Post, 'comments_count', Comment, 'post_id', batch_size)
+
+
+def reconcile_groups(batch_size):
+    return _reconcile(Group, 'posts_count', Post, 'group_id', batch_size)
@@ -0,0 +1,275 @@
+# posts/dataset.py
+'''Воспроизводимый набор данных для проверки под нагрузкой.
+
+generate создаёт пользователей, сообщества, посты, комментарии,
+подписки и ленты подписок. Один и тот же seed даёт те же строки:
+тексты собираются из словаря Faker, даты отсчитываются от END,
+а не от текущего времени. Авторы постов, популярные посты и авторы,
+на которых подписываются, выбираются по закону Ципфа, а несколько
+знаменитостей собирают подписчиков у заметной доли пользователей.
+
+Строки пишутся мимо ORM пачками: на PostgreSQL - COPY, на остальных
+базах - executemany одного INSERT. Сигналы при этом не срабатывают,
+поэтому счётчики пересчитываются в конце (counters.reconcile_*),
+а ленты подписок собираются из уже созданных постов в памяти.
+Триггеры полнотекстового индекса SQLite на время загрузки снимаются,
+индекс перестраивается один раз в конце. На PostgreSQL векторы
+заполняет триггер при загрузке, и индекс не перестраивается.
+'''
+import csv
+import heapq
+import io
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+from django.db.models import AutoField, DateTimeField
+from faker import Faker
+
+from . import caching, counters, rendering, search
+from .models import Comment, Follow, Group, Post, TimelineEntry, User
+
+END = datetime(2022, 1, 1, tzinfo=timezone.utc)
+VOCABULARY_SIZE = 2000
+NAMES = 300
+# Значение NULL в COPY: пустая строка должна остаться пустой строкой.
+COPY_NULL = r'\N'
+
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _zipf_weights(count, alpha):
+    return list(accumulate(1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+class BulkWriter:
+    '''Вставка строк модели мимо ORM. Строка - словарь attname ->
+    значение; незаданные поля получают значения по умолчанию.'''
+
+    def __init__(self, model):
+        self.model = model
+        self.connection = connections[router.db_for_write(model)]
+        self.fields = [field for field in model._meta.concrete_fields
+                       if not isinstance(field, AutoField)]
+        self.defaults = {
+            field.attname: field.get_db_prep_save(field.get_default(),
+                                                  self.connection)
+            for field in self.fields
+        }
+        self.dates = {field.attname for field in self.fields
+                      if isinstance(field, DateTimeField)}
+
+    def prepare(self, row):
+        adapt = self.connection.ops.adapt_datetimefield_value
+        return tuple(
+            (adapt(row[name]) if name in self.dates else row[name])
+            if name in row else self.defaults[name]
+            for name in (field.attname for field in self.fields)
+        )
+
+    def write(self, rows):
+        quote = self.connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        columns = ', '.join(quote(field.column) for field in self.fields)
+        values = [self.prepare(row) for row in rows]
+        with self.connection.cursor() as cursor:
+            if self.connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(
+                    [COPY_NULL if value is None else value
+                     for value in row] for row in values)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY {table} ({columns}) FROM STDIN "
+                    f"WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer)
+            else:
+                placeholders = ', '.join(['%s'] * len(self.fields))
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'VALUES ({placeholders})', values)
+
+
+class Generator:
+    def __init__(self, seed, prefix, batch_size, alpha, log):
+        self.rng = random.Random(seed)
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        self.words = fake.words(VOCABULARY_SIZE)
+        self.first_names = [fake.first_name() for _ in range(NAMES)]
+        self.last_names = [fake.last_name() for _ in range(NAMES)]
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.alpha = alpha
+        self.log = log
+        self.stats = {}
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(self.words,
+                                         k=self.rng.randint(low, high)))
+
+    def dates(self, count, days):
+        '''count дат за days дней до END, по возрастанию.'''
+        seconds = days * 24 * 3600
+        start = END - timedelta(seconds=seconds)
+        return [start + timedelta(seconds=offset) for offset in
+                sorted(self.rng.randrange(seconds) for _ in range(count))]
+
+    def insert(self, model, rows, ids=True):
+        '''Пишет rows пачками; если ids, возвращает первичные ключи
+        новых строк в порядке вставки.'''
+        last_id = (model.objects.order_by('-pk')
+                   .values_list('pk', flat=True).first() or 0)
+        writer = BulkWriter(model)
+        started = time.perf_counter()
+        written = 0
+        for batch in _batches(rows, self.batch_size):
+            writer.write(batch)
+            written += len(batch)
+        elapsed = time.perf_counter() - started
+        self.stats[model.__name__] = written
+        self.log(f'{model.__name__}: {written} строк, '
+                 f'{written / elapsed if elapsed else 0:.0f} строк/с')
+        if not ids:
+            return None
+        return list(model.objects.filter(pk__gt=last_id).order_by('pk')
+                    .values_list('pk', flat=True))
+
+    def users(self, count, days, password):
+        password = make_password(password)
+        return self.insert(User, (
+            {'username': f'{self.prefix}{index:07d}', 'password': password,
+             'first_name': self.rng.choice(self.first_names),
+             'last_name': self.rng.choice(self.last_names),
+             'date_joined': date_joined}
+            for index, date_joined in enumerate(self.dates(count, days))
+        ))
+
+    def groups(self, count):
+        return self.insert(Group, (
+            {'title': self.text(1, 3).capitalize(),
+             'slug': f'{self.prefix}-{index}',
+             'description': self.text(10, 30)}
+            for index in range(count)
+        ))
+
+    def posts(self, count, days, authors, group_ids, group_share):
+        weights = _zipf_weights(len(authors), self.alpha)
+        self.posts_by_author = defaultdict(list)
+        rows = []
+        for pub_date in self.dates(count, days):
+            text = self.text(5, 80)
+            rows.append({
+                'author_id': self.rng.choices(authors,
+                                              cum_weights=weights)[0],
+                'group_id': (self.rng.choice(group_ids)
+                             if self.rng.random() < group_share else None),
+                'text': text,
+                'rendered_text': rendering.render_text(text),
+                'rendered_title': rendering.render_title(text),
+                'pub_date': pub_date,
+            })
+        post_ids = self.insert(Post, rows)
+        for post_id, row in zip(post_ids, rows):
+            self.posts_by_author[row['author_id']].append(
+                (row['pub_date'], post_id))
+        self.post_dates = [row['pub_date'] for row in rows]
+        return post_ids
+
+    def comments(self, count, post_ids, user_ids):
+        # Популярные посты разбросаны по времени, а не только новые.
+        popular = self.rng.sample(range(len(post_ids)), len(post_ids))
+        weights = _zipf_weights(len(popular), self.alpha)
+
+        def comment():
+            index = self.rng.choices(popular, cum_weights=weights)[0]
+            created = self.post_dates[index] + timedelta(
+                seconds=self.rng.randrange(7 * 24 * 3600))
+            return {'post_id': post_ids[index],
+                    'author_id': self.rng.choice(user_ids),
+                    'text': self.text(3, 30), 'created': created}
+
+        self.insert(Comment, (comment() for _ in range(count)), ids=False)
+
+    def follows(self, user_ids, authors, mean, celebrities, celebrity_share):
+        weights = _zipf_weights(len(authors), self.alpha)
+        stars = authors[:celebrities]
+        self.following = {}
+        for user_id in user_ids:
+            count = int(self.rng.expovariate(1 / mean)) if mean else 0
+            followed = set(self.rng.choices(authors, cum_weights=weights,
+                                            k=count))
+            followed.update(star for star in stars
+                            if self.rng.random() < celebrity_share)
+            followed.discard(user_id)
+            self.following[user_id] = sorted(followed)
+        self.insert(Follow, ({'user_id': user_id, 'author_id': author_id}
+                             for user_id, followed in self.following.items()
+                             for author_id in followed), ids=False)
+
+    def timelines(self):
+        '''Ленты подписок: TIMELINE_LENGTH последних постов авторов,
+        на которых подписан пользователь, как после rebuild.'''
+        newest_first = {author_id: posts[::-1] for author_id, posts
+                        in self.posts_by_author.items()}
+
+        def entries(user_id, followed):
+            merged = heapq.merge(
+                *(((pub_date, post_id, author_id)
+                   for pub_date, post_id in newest_first.get(author_id, ()))
+                  for author_id in followed),
+                reverse=True)
+            for pub_date, post_id, author_id in islice(
+                    merged, settings.TIMELINE_LENGTH):
+                yield {'user_id': user_id, 'post_id': post_id,
+                       'author_id': author_id, 'pub_date': pub_date}
+
+        self.insert(TimelineEntry, (
+            entry for user_id, followed in self.following.items()
+            for entry in entries(user_id, followed)), ids=False)
+
+
+def generate(users=1000, groups=20, posts=10000, comments=20000,
+             follows=20, celebrities=5, celebrity_share=0.3, seed=0,
+             prefix='gen', password='password', days=365, group_share=0.7,
+             alpha=1.1, batch_size=5000, timelines=True, log=lambda _: None):
+    '''Создаёт набор данных и возвращает число строк по моделям.
+    follows - среднее число подписок пользователя.'''
+    generator = Generator(seed, prefix, batch_size, alpha, log)
+    connection = connections[router.db_for_write(Post)]
+    with transaction.atomic():
+        rebuild_index = search.drop_triggers(connection)
+        user_ids = generator.users(users, days, password)
+        group_ids = generator.groups(groups)
+        # Порядок авторов по популярности: первые - знаменитости.
+        authors = generator.rng.sample(user_ids, len(user_ids))
+        post_ids = generator.posts(posts, days, authors, group_ids,
+                                   group_share)
+        if post_ids:
+            generator.comments(comments, post_ids, user_ids)
+        generator.follows(user_ids, authors, follows, celebrities,
+                          celebrity_share)
+        if timelines:
+            generator.timelines()
+        if rebuild_index:
+            started = time.perf_counter()
+            search.install_index(connection)
+            log(f'Поисковый индекс: {time.perf_counter() - started:.1f} с')
+        started = time.perf_counter()
+        counters.reconcile_users(batch_size)
+        counters.reconcile_posts(batch_size)
+        counters.reconcile_groups(batch_size)
+        log(f'Счётчики: {time.perf_counter() - started:.1f} с')
+    caching.bump_index_version()
+    return generator.stats
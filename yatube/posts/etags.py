@@ -0,0 +1,67 @@
+# posts/etags.py
+'''Валидаторы условных GET-запросов (ETag) для лент и страницы поста.
+
+ETag считается без отрисовки: из версий кэша (posts/caching.py),
+которые увеличивает каждая запись поста и правка выводимых имён
+пользователей и сообществ, и не более чем одного
+запроса по индексу к строке, от которой зависит страница. В него
+входят адрес с параметрами (страница, курсор) и пользователь, так как
+шапка и кнопки зависят от того, кто смотрит. Совпавший If-None-Match
+получает 304 без выборки ленты и отрисовки.
+
+Last-Modified не отдаётся: правка поста не меняет pub_date, и клиент,
+присылающий только If-Modified-Since, получил бы устаревшую страницу.
+'''
+import hashlib
+
+from . import caching
+from .models import Group, Post, UserStats
+
+
+def _etag(request, *parts):
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    raw = '|'.join(str(part) for part in
+                   (*parts, user_id, request.get_full_path()))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _version(key):
+    return caching.versions([key])[key]
+
+
+def index_etag(request):
+    return _etag(request, 'index', _version(caching.INDEX_VERSION_KEY))
+
+
+def group_etag(request, slug):
+    group = (Group.objects.filter(slug=slug)
+             .values_list('pk', 'title', 'description').first())
+    if group is None:
+        return None
+    group_key = caching.GROUP_VERSION_KEY.format(group[0])
+    return _etag(request, 'group', _version(group_key), *group)
+
+
+def profile_etag(request, username):
+    stats = (UserStats.objects.filter(user__username=username)
+             .values_list('user_id', 'posts_count', 'followers_count',
+                          'following_count').first())
+    if stats is None:
+        return None
+    author_key = caching.AUTHOR_VERSION_KEY.format(stats[0])
+    keys = [author_key]
+    if request.user.is_authenticated:
+        keys.append(caching.FOLLOWS_VERSION_KEY.format(request.user.pk))
+    current = caching.versions(keys)
+    return _etag(request, 'profile', *stats,
+                 *(current[key] for key in keys))
+
+
+def post_etag(request, post_id):
+    post = (Post.objects.filter(pk=post_id)
+            .values_list('author_id', 'comments_count').first())
+    if post is None:
+        return None
+    author_id, comments_count = post
+    author_version = _version(caching.AUTHOR_VERSION_KEY.format(author_id))
+    return _etag(request, 'post', post_id, author_version, comments_count)
@@ -0,0 +1,165 @@
+# posts/feeds.py
+'''Общий слой загрузки лент index, group_posts, profile и follow_index
+и страницы поста post_detail.
+
+Ленты выбираются вместе с автором и сообществом (select_related),
+поэтому страница из POSTS_PER_PAGE постов стоит фиксированного числа
+запросов, не зависящего от числа постов на ней. В строгом режиме
+(FEED_STRICT_LOADING) превышение бюджета запросов при загрузке
+и любой запрос во время отрисовки шаблона завершаются ошибкой
+LazyLoadError с текстом запроса. Записи о миниатюрах картинок
+страницы загружаются заранее одним запросом (thumbnails.prefetch),
+карточки постов берутся из кэша одним get_many (posts/cards.py).
+'''
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.shortcuts import get_object_or_404, render
+
+from core.queries import template_location, watch_queries
+
+from . import cards, thumbnails
+from .counters import user_stats
+from .models import Comment, Post, UserStats
+from .paginators import CursorPaginator
+
+CURSOR_PARAMS = ('after', 'before')
+FEED_RELATIONS = ('author', 'group')
+
+
+class LazyLoadError(AssertionError):
+    '''Лента выполнила запрос, которого не должно было быть.'''
+
+
+def use_cursor(request):
+    '''Курсорный режим включается настройкой POSTS_PAGINATION
+    или наличием в запросе токенов ?after=/?before=.'''
+    return (settings.POSTS_PAGINATION == 'cursor'
+            or any(param in request.GET for param in CURSOR_PARAMS))
+
+
+def posts_paginator(request, posts, context, keys=('-pub_date', '-id'),
+                    cursor=False):
+    '''Функция добавляет в контекст паджинатор для
+    функциий index, group_posts и profile.
+    В курсорном режиме (или при cursor=True) страница выбирается
+    по ключу keys без COUNT(*) и OFFSET.
+    '''
+    if cursor or use_cursor(request):
+        paginator = CursorPaginator(posts, settings.POSTS_PER_PAGE, keys)
+        page_obj = paginator.get_page(after=request.GET.get('after'),
+                                      before=request.GET.get('before'))
+    else:
+        paginator = Paginator(posts, settings.POSTS_PER_PAGE)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+    context['page_obj'] = page_obj
+    return context
+
+
+@contextmanager
+def query_budget(budget, label):
+    '''В строгом режиме запрещает выполнить больше budget запросов.'''
+    if not settings.FEED_STRICT_LOADING:
+        yield
+        return
+    executed = []
+
+    def handler(execute, sql, params, many, context):
+        executed.append(sql)
+        if len(executed) > budget:
+            raise LazyLoadError(
+                f'{label}: превышен бюджет в {budget} запроса(ов), '
+                f'лишний запрос: {sql}'
+            )
+        return execute(sql, params, many, context)
+
+    with watch_queries(handler):
+        yield
+
+
+@contextmanager
+def forbid_queries(label):
+    '''В строгом режиме запрещает блоку обращаться к базе.'''
+    if not settings.FEED_STRICT_LOADING:
+        yield
+        return
+
+    def handler(execute, sql, params, many, context):
+        raise LazyLoadError(
+            f'{template_location() or label}: '
+            f'шаблон выполнил запрос к базе: {sql}')
+
+    with watch_queries(handler):
+        yield
+
+
+def load_feed(request, posts, context, keys=('-pub_date', '-id'),
+              through=None, cursor=False):
+    '''Загружает в контекст страницу ленты вместе с авторами и
+    сообществами постов. through - имя связи с постом, если лента
+    выбирается из промежуточной таблицы (например, TimelineEntry).
+    cursor=True включает курсорные страницы независимо от настройки.
+    '''
+    relations = [f'{through}__{relation}' if through else relation
+                 for relation in FEED_RELATIONS]
+    with query_budget(settings.FEED_QUERY_BUDGET, 'load_feed'):
+        context = posts_paginator(request, posts.select_related(*relations),
+                                  context, keys, cursor)
+        page_obj = context['page_obj']
+        if through:
+            page_obj.object_list = [getattr(row, through)
+                                    for row in page_obj.object_list]
+        else:
+            page_obj.object_list = list(page_obj.object_list)
+    thumbnails.prefetch(page_obj.object_list)
+    with forbid_queries(cards.CARD_TEMPLATE):
+        cards.attach(page_obj.object_list)
+    return context
+
+
+def load_comments(post_id, after=None):
+    '''Страница из COMMENTS_PER_PAGE комментариев поста с авторами,
+    выбранная по ключу (created, id) одним запросом.'''
+    comments = (Comment.objects.filter(post_id=post_id)
+                .select_related('author'))
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE,
+                                keys=('-created', '-id'))
+    return paginator.get_page(after=after)
+
+
+def load_post_detail(post_id):
+    '''Загружает страницу поста: пост вместе с автором, его счётчиками
+    и сообществом - одним запросом, первую страницу комментариев
+    с авторами - вторым. Отсутствующий пост - 404.
+    '''
+    with query_budget(settings.DETAIL_QUERY_BUDGET, 'load_post_detail'):
+        post = get_object_or_404(
+            Post.objects.select_related('author', 'author__stats', 'group'),
+            pk=post_id
+        )
+        comments = load_comments(post.pk)
+    thumbnails.prefetch([post])
+    try:
+        stats = post.author.stats
+    except UserStats.DoesNotExist:
+        stats = user_stats(post.author)
+    return {'post': post,
+            'author': post.author,
+            'stats': stats,
+            'group_name': post.group.title if post.group else '',
+            'comments': comments,
+            }
+
+
+def render_feed(request, template, context):
+    '''Отрисовывает ленту. В строгом режиме шаблону запрещено
+    обращаться к базе: все данные уже должны быть загружены.'''
+    if not settings.FEED_STRICT_LOADING:
+        return render(request, template, context)
+    # Пользователь и сессия загружаются лениво; делаем это заранее,
+    # чтобы не принять их за ленивую загрузку из шаблона.
+    request.user.is_authenticated
+    with forbid_queries(template):
+        return render(request, template, context)
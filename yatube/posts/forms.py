@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import check_upload
 from .models import Comment, Post
 
 
@@ -8,6 +10,25 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файл, обрезанный ImageSizeLimitHandler, не передаётся полю:
+        # иначе вместо ошибки объёма будет ошибка формата.
+        key = self.add_prefix('image')
+        self.oversized_image = None
+        if getattr(self.files.get(key), 'oversized', False):
+            self.oversized_image = self.files[key]
+            self.files = self.files.copy()
+            del self.files[key]
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if self.oversized_image is not None:
+            check_upload(self.oversized_image)
+        if isinstance(image, UploadedFile):
+            check_upload(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
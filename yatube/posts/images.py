@@ -0,0 +1,211 @@
+# posts/images.py
+'''Сведения о картинках постов.
+
+Ширина, высота, формат, размер в байтах и хеш содержимого картинки
+сохраняются в Post при загрузке (сигнал pre_save), поэтому шаблонам
+и миниатюрам не нужно открывать исходный файл. Pillow читает только
+заголовок картинки, пиксели не декодируются. Посты, загруженные
+раньше, дозаполняет команда backfill_image_metadata.
+
+Загрузка проверяется по заголовку (check_upload): объём файла
+и число пикселей. Слишком большие картинки уменьшаются до
+IMAGE_MAX_SIDE вне запроса, в пуле процессов (process_upload), чтобы
+декодирование больших фотографий не раздувало память веб-процессов.
+'''
+import hashlib
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image
+
+from . import thumbnails
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FIELDS = ('image_width', 'image_height', 'image_format',
+                'image_size', 'image_hash')
+# Форматы, которые уменьшаются без потерь свойств (GIF - без анимации).
+DOWNSCALE_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+_pool = None
+_lock = threading.Lock()
+
+
+def image_metadata(file):
+    '''Сведения о картинке из открытого файла; позиция в файле
+    возвращается в начало.'''
+    file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        image_format = image.format or ''
+    file.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_format': image_format,
+        'image_size': size,
+        'image_hash': digest.hexdigest(),
+    }
+
+
+def _apply(post, metadata):
+    for field, value in metadata.items():
+        setattr(post, field, value)
+
+
+def clear_metadata(post):
+    _apply(post, {field: Post._meta.get_field(field).get_default()
+                  for field in IMAGE_FIELDS})
+
+
+def fill_metadata(post):
+    '''Заполняет сведения о только что загруженной картинке поста.
+    Уже сохранённые картинки не перечитываются.'''
+    image = post.image
+    if not image:
+        clear_metadata(post)
+        return
+    if image._committed:
+        return
+    _apply(post, image_metadata(image.file))
+
+
+def backfill(batch_size):
+    '''Заполняет сведения о картинках постов, где их нет, пачками
+    по batch_size. Возвращает число заполненных и пропущенных
+    (файл не найден или не читается) постов.'''
+    filled = skipped = 0
+    last_id = 0
+    while True:
+        posts = list(
+            Post.objects.exclude(image='').filter(image_hash='',
+                                                  pk__gt=last_id)
+            .order_by('pk').only('pk', 'image')[:batch_size]
+        )
+        if not posts:
+            return filled, skipped
+        last_id = posts[-1].pk
+        updated = []
+        for post in posts:
+            try:
+                with post.image.open('rb') as file:
+                    _apply(post, image_metadata(file))
+            except (OSError, ValueError):
+                skipped += 1
+                continue
+            updated.append(post)
+        Post.objects.bulk_update(updated, IMAGE_FIELDS)
+        filled += len(updated)
+
+
+def check_upload(upload):
+    '''Проверяет загруженную картинку по объёму и по размерам из
+    заголовка, не декодируя пиксели.'''
+    limit = settings.IMAGE_UPLOAD_MAX_BYTES
+    if getattr(upload, 'oversized', False) or upload.size > limit:
+        raise ValidationError(
+            f'Файл больше {limit // (1024 * 1024)} МБ.', code='too_big')
+    # forms.ImageField оставляет открытую по заголовку картинку в image.
+    image = getattr(upload, 'image', None)
+    if image is None:
+        with Image.open(upload) as image:
+            size = image.size
+        upload.seek(0)
+    else:
+        size = image.size
+    width, height = size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка {width}x{height} больше '
+            f'{settings.IMAGE_MAX_PIXELS // 1_000_000} мегапикселей.',
+            code='too_many_pixels')
+
+
+def needs_downscale(post):
+    return (post.image_format in DOWNSCALE_FORMATS
+            and max(post.image_width or 0, post.image_height or 0)
+            > settings.IMAGE_MAX_SIDE)
+
+
+def downscale(name, max_side):
+    '''Уменьшает картинку name до max_side по большей стороне и
+    записывает её на место исходной. Возвращает новое имя файла
+    и сведения о картинке. Выполняется в процессе пула.'''
+    output = BytesIO()
+    with default_storage.open(name, 'rb') as file:
+        with Image.open(file) as image:
+            image_format = image.format
+            # JPEG декодируется сразу в уменьшенном масштабе.
+            image.draft(image.mode, (max_side, max_side))
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            params = {'quality': 90} if image_format == 'JPEG' else {}
+            image.save(output, format=image_format, **params)
+    default_storage.delete(name)
+    new_name = default_storage.save(name, ContentFile(output.getvalue()))
+    return new_name, image_metadata(output)
+
+
+def _downscaled(name, new_name, metadata):
+    Post.objects.filter(image=name).update(image=new_name, **metadata)
+    thumbnails.schedule(new_name)
+
+
+def _downscale_done(name, future):
+    try:
+        _downscaled(name, *future.result())
+    except Exception:
+        logger.exception('Не удалось уменьшить картинку %s', name)
+        thumbnails.schedule(name)
+    finally:
+        connections.close_all()
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: веб-процесс многопоточный, fork из него небезопасен.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _pool
+
+
+def _submit(name):
+    future = _get_pool().submit(downscale, name, settings.IMAGE_MAX_SIDE)
+    future.add_done_callback(partial(_downscale_done, name))
+
+
+def process_upload(post):
+    '''Обрабатывает новую картинку поста после фиксации транзакции:
+    слишком большую уменьшает в пуле процессов, затем ставит в очередь
+    миниатюры. При IMAGE_PROCESS_WORKERS = 0 уменьшает сразу.'''
+    if not post.image:
+        return
+    if not needs_downscale(post):
+        thumbnails.schedule(post.image)
+        return
+    name = post.image.name
+    if not settings.IMAGE_PROCESS_WORKERS:
+        _downscaled(name, *downscale(name, settings.IMAGE_MAX_SIDE))
+        return
+    transaction.on_commit(lambda: _submit(name))
@@ -0,0 +1,96 @@
+# posts/kvstore.py
+'''Хранилище ключей sorl-thumbnail с LRU в памяти процесса.
+
+Каждая миниатюра в шаблоне ищет свою запись в хранилище ключей:
+стандартное cached_db обращается к кэшу, а при промахе - к базе.
+LRUKVStore держит до THUMBNAIL_LRU_SIZE найденных записей в памяти
+процесса (не дольше THUMBNAIL_LRU_TIMEOUT секунд), а prefetch
+загружает записи всей страницы ленты одним запросом get_many к кэшу
+и одним запросом к базе для промахов.
+
+Отсутствующие записи в LRU не попадают: миниатюру может создать
+другой процесс, и заглушка не должна залипать.
+'''
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class LRUKVStore(KVStore):
+    def __init__(self):
+        super().__init__()
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, value):
+        expires = time.monotonic() + settings.THUMBNAIL_LRU_TIMEOUT
+        with self._lock:
+            self._lru[key] = (value, expires)
+            self._lru.move_to_end(key)
+            while len(self._lru) > settings.THUMBNAIL_LRU_SIZE:
+                self._lru.popitem(last=False)
+
+    def _recall(self, key):
+        with self._lock:
+            value, expires = self._lru.get(key, (None, 0))
+            if value is None:
+                return None
+            if expires < time.monotonic():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return value
+
+    def _forget(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._lru.pop(key, None)
+
+    def clear_local(self):
+        '''Очищает LRU этого процесса.'''
+        with self._lock:
+            self._lru.clear()
+
+    def _get_raw(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        self._forget(*keys)
+
+    def prefetch(self, image_files):
+        '''Загружает в LRU записи image_files, которых там нет:
+        одним get_many к кэшу и одним запросом к базе для промахов.'''
+        keys = {add_prefix(image_file.key) for image_file in image_files}
+        missing = [key for key in keys if self._recall(key) is None]
+        if not missing:
+            return
+        found = self.cache.get_many(missing)
+        rest = [key for key in missing if key not in found]
+        if rest:
+            rows = dict(KVStoreModel.objects.filter(key__in=rest)
+                        .values_list('key', 'value'))
+            # Как cached_db: отсутствие записи тоже кэшируется,
+            # чтобы следующая страница не шла в базу.
+            fetched = {key: rows.get(key, EMPTY_VALUE) for key in rest}
+            self.cache.set_many(fetched,
+                                sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(fetched)
+        for key, value in found.items():
+            if value != EMPTY_VALUE:
+                self._remember(key, value)
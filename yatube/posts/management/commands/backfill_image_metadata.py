@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    help = ('Заполняет размеры, формат, объём и хеш картинок постов, '
+            'загруженных до появления этих полей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.IMAGE_BACKFILL_BATCH_SIZE,
+            help='Сколько постов обрабатывать за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        filled, skipped = images.backfill(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено постов: {filled}'))
+        if skipped:
+            self.stderr.write(
+                f'Пропущено постов (файл не найден или не читается): '
+                f'{skipped}')
@@ -0,0 +1,247 @@
+import json
+import math
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.models import Count
+from django.middleware.csrf import _get_new_csrf_token
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+VIEWS = ('index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+         'post_create', 'add_comment')
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, rank):
+    '''Процентиль по ближайшему рангу.'''
+    index = max(math.ceil(rank / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = ('Нагружает представления через WSGI-приложение с постоянным '
+            'числом параллельных клиентов и записывает запросы в секунду '
+            'и задержки p50/p95/p99. Запускайте на копии базы, '
+            'заполненной generate_dataset: post_create и add_comment '
+            'создают посты и комментарии.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', default=','.join(VIEWS),
+                            help='Представления через запятую.')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Число параллельных клиентов.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов к каждому представлению.')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Запросов для прогрева, не считаются.')
+        parser.add_argument('--logged-in', action='store_true',
+                            help='Читать ленты от имени пользователя.')
+        parser.add_argument('--label', default='',
+                            help='Метка прогона; по умолчанию - коммит.')
+        parser.add_argument('--output', default='benchmark.json',
+                            help='JSON-файл, в который дописывается прогон.')
+
+    def handle(self, *args, **options):
+        views = [view for view in options['views'].split(',') if view]
+        unknown = set(views) - set(VIEWS)
+        if unknown:
+            raise CommandError(f'Неизвестные представления: '
+                               f'{", ".join(sorted(unknown))}')
+        self.application = get_wsgi_application()
+        self.targets = self.pick_targets()
+        self.cookies = self.login(self.targets['user'])
+        commit = self.commit()
+        results = {}
+        for view in views:
+            results[view] = self.run(view, options)
+            result = results[view]
+            self.stdout.write(
+                f"{view}: {result['rps']:.1f} запр/с, "
+                f"p50 {result['p50_ms']:.1f} мс, "
+                f"p95 {result['p95_ms']:.1f} мс, "
+                f"p99 {result['p99_ms']:.1f} мс, "
+                f"ошибок {result['errors']}"
+            )
+        run = {
+            'label': options['label'] or commit,
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'vendor': connections['default'].vendor,
+            'concurrency': options['concurrency'],
+            'logged_in': options['logged_in'],
+            'rows': {model.__name__: model.objects.count()
+                     for model in (User, Group, Post, Comment, Follow)},
+            'views': results,
+        }
+        try:
+            with open(options['output']) as file:
+                runs = json.load(file)
+        except FileNotFoundError:
+            runs = []
+        if runs:
+            self.compare(runs[-1], run)
+        runs.append(run)
+        with open(options['output'], 'w') as file:
+            json.dump(runs, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Прогон {run['label']} записан в {options['output']}"))
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ''
+
+    def pick_targets(self):
+        '''Самые нагруженные сообщество, автор, пост и подписчик.'''
+        def busiest(queryset, field):
+            return (queryset.order_by().values(field)
+                    .annotate(total=Count('pk')).order_by('-total')
+                    .values_list(field, flat=True).first())
+
+        post_id = busiest(Comment.objects, 'post') or (
+            Post.objects.values_list('pk', flat=True).last())
+        group_id = busiest(Post.objects.filter(group__isnull=False), 'group')
+        author_id = busiest(Post.objects, 'author')
+        user_id = busiest(Follow.objects, 'user') or author_id
+        if None in (post_id, group_id, author_id):
+            raise CommandError('В базе нет постов или сообществ: '
+                               'сначала запустите generate_dataset.')
+        return {
+            'post_id': post_id,
+            'group': Group.objects.get(pk=group_id),
+            'author': User.objects.get(pk=author_id),
+            'user': User.objects.get(pk=user_id),
+        }
+
+    def login(self, user):
+        client = Client()
+        client.force_login(user)
+        csrf_token = _get_new_csrf_token()
+        return {
+            settings.SESSION_COOKIE_NAME:
+                client.cookies[settings.SESSION_COOKIE_NAME].value,
+            settings.CSRF_COOKIE_NAME: csrf_token,
+        }
+
+    def request(self, view, logged_in):
+        '''Метод, путь и данные формы для представления view.'''
+        targets = self.targets
+        urls = {
+            'index': reverse('posts:index'),
+            'group_posts': reverse('posts:group_list',
+                                   args=(targets['group'].slug,)),
+            'profile': reverse('posts:profile',
+                               args=(targets['author'].username,)),
+            'post_detail': reverse('posts:post_detail',
+                                   args=(targets['post_id'],)),
+            'follow_index': reverse('posts:follow_index'),
+            'post_create': reverse('posts:post_create'),
+            'add_comment': reverse('posts:add_comment',
+                                   args=(targets['post_id'],)),
+        }
+        if view in ('post_create', 'add_comment'):
+            return 'POST', urls[view], {'text': 'Нагрузочный тест'}, True
+        return 'GET', urls[view], None, logged_in or view == 'follow_index'
+
+    def environ(self, method, url, data, logged_in):
+        path = urlsplit(url)
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path.path,
+            'QUERY_STRING': path.query,
+            'SERVER_NAME': 'localhost',
+            'wsgi.input': BytesIO(body),
+            'CONTENT_LENGTH': str(len(body)),
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        }
+        if logged_in:
+            environ['HTTP_COOKIE'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items())
+            environ['HTTP_X_CSRFTOKEN'] = (
+                self.cookies[settings.CSRF_COOKIE_NAME])
+        setup_testing_defaults(environ)
+        return environ
+
+    def call(self, request):
+        '''Выполняет запрос, возвращает (секунды, ошибка ли).'''
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status.split()[0]))
+
+        started = time.perf_counter()
+        response = self.application(self.environ(*request), start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return time.perf_counter() - started, statuses[0] >= 400
+
+    def worker(self, request, count):
+        try:
+            return [self.call(request) for _ in range(count)]
+        finally:
+            # Соединения с базой принадлежат потоку клиента.
+            connections.close_all()
+
+    def run(self, view, options):
+        request = self.request(view, options['logged_in'])
+        concurrency = options['concurrency']
+        for _ in range(options['warmup']):
+            self.call(request)
+        counts = [options['requests'] // concurrency
+                  + (index < options['requests'] % concurrency)
+                  for index in range(concurrency)]
+        started = time.perf_counter()
+        if concurrency == 1:
+            calls = [self.call(request) for _ in range(counts[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                calls = [call for calls in executor.map(
+                    lambda count: self.worker(request, count), counts)
+                    for call in calls]
+        elapsed = time.perf_counter() - started
+        timings = sorted(seconds * 1000 for seconds, _ in calls)
+        result = {
+            'method': request[0],
+            'url': request[1],
+            'requests': len(calls),
+            'errors': sum(error for _, error in calls),
+            'rps': len(calls) / elapsed if elapsed else 0,
+            'mean_ms': sum(timings) / len(timings) if timings else 0,
+        }
+        for rank in PERCENTILES:
+            result[f'p{rank}_ms'] = (percentile(timings, rank)
+                                     if timings else 0)
+        return result
+
+    def compare(self, previous, run):
+        '''Выводит изменение запросов в секунду и p95 относительно
+        предыдущего прогона в файле.'''
+        self.stdout.write(f"Сравнение с прогоном {previous['label']}:")
+        for view, result in run['views'].items():
+            before = previous['views'].get(view)
+            if not before or not before['rps'] or not before['p95_ms']:
+                continue
+            self.stdout.write(
+                f"  {view}: запр/с "
+                f"{(result['rps'] / before['rps'] - 1) * 100:+.1f}%, "
+                f"p95 {(result['p95_ms'] / before['p95_ms'] - 1) * 100:+.1f}%"
+            )
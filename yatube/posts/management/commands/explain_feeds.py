@@ -0,0 +1,111 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+# Столбцы, которые выводят ленты и страница поста. Запросы выбирают
+# только их, а не все поля текущей модели: так команда работает и на
+# схеме до индексов лент (posts 0003), где более поздних полей нет.
+POST_COLUMNS = ('id', 'text', 'pub_date', 'image', 'author_id',
+                'group_id', 'author__username', 'author__first_name',
+                'author__last_name', 'group__title', 'group__slug')
+COMMENT_COLUMNS = ('id', 'text', 'created', 'author_id',
+                   'author__username', 'author__first_name',
+                   'author__last_name')
+
+
+class Command(BaseCommand):
+    help = ('Записывает планы EXPLAIN и время основных запросов лент, '
+            'страницы поста и проверки подписки. Чтобы сравнить индексы: '
+            'заполните базу (generate_dataset), выполните '
+            '"migrate posts 0003" и запустите команду с --label before, '
+            'затем "migrate" и --label after с тем же --output.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--label', default='run',
+                            help='Метка прогона, например before/after.')
+        parser.add_argument('--output', default='explain_feeds.json',
+                            help='JSON-файл, в который дописывается прогон.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Сколько раз выполнить каждый запрос.')
+
+    def handle(self, *args, **options):
+        queries = self.queries()
+        results = {}
+        for name, queryset in queries.items():
+            results[name] = self.measure(queryset, options['repeat'])
+            self.stdout.write(
+                f"{name}: {results[name]['median_ms']:.2f} мс\n"
+                f"{results[name]['plan']}"
+            )
+        run = {
+            'label': options['label'],
+            'vendor': connection.vendor,
+            'rows': {model.__name__: model.objects.count()
+                     for model in (User, Group, Post, Comment, Follow)},
+            'queries': results,
+        }
+        try:
+            with open(options['output']) as file:
+                runs = json.load(file)
+        except FileNotFoundError:
+            runs = []
+        runs.append(run)
+        with open(options['output'], 'w') as file:
+            json.dump(runs, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Прогон {options['label']} записан в {options['output']}"))
+
+    def queries(self):
+        '''Запросы в том виде, в каком их выполняют представления,
+        для самых тяжёлых автора, сообщества, поста и подписчика.'''
+        per_page = settings.POSTS_PER_PAGE
+        feed = Post.objects.values(*POST_COLUMNS)
+
+        def busiest(queryset, field):
+            return (queryset.order_by().values(field)
+                    .annotate(total=Count('pk')).order_by('-total')
+                    .values_list(field, flat=True).first())
+
+        author_id = busiest(Post.objects, 'author')
+        group_id = busiest(Post.objects.filter(group__isnull=False), 'group')
+        post_id = busiest(Comment.objects, 'post')
+        reader_id = (busiest(TimelineEntry.objects, 'user')
+                     or busiest(Follow.objects, 'user'))
+        followed_id = (Follow.objects.filter(user_id=reader_id)
+                       .values_list('author_id', flat=True).first())
+        return {
+            'index': feed.all()[:per_page],
+            'group_posts': feed.filter(group_id=group_id)[:per_page],
+            'profile': feed.filter(author_id=author_id)[:per_page],
+            'follow_index': (
+                TimelineEntry.objects.filter(user_id=reader_id)
+                .values(*(f'post__{column}'
+                          for column in POST_COLUMNS))[:per_page]
+            ),
+            'post_detail_comments': (
+                Comment.objects.filter(post_id=post_id)
+                .values(*COMMENT_COLUMNS)[:per_page]
+            ),
+            'follow_check': Follow.objects.filter(
+                user_id=reader_id, author_id=followed_id).values('id'),
+        }
+
+    def measure(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset._chain())
+            timings.append((time.perf_counter() - started) * 1000)
+        return {
+            'sql': str(queryset.query),
+            'plan': queryset.explain(),
+            'best_ms': min(timings),
+            'median_ms': statistics.median(timings),
+        }
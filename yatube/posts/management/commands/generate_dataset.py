@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from posts import dataset
+
+
+class Command(BaseCommand):
+    help = ('Создаёт воспроизводимый набор данных: пользователей, '
+            'сообщества, посты, комментарии и подписки со знаменитостями. '
+            'Тот же --seed даёт те же данные.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--celebrities', type=int, default=5,
+                            help='Сколько авторов-знаменитостей.')
+        parser.add_argument('--celebrity-share', type=float, default=0.3,
+                            help='Доля пользователей, подписанных '
+                                 'на каждую знаменитость.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='gen',
+                            help='Префикс имён пользователей и адресов '
+                                 'сообществ.')
+        parser.add_argument('--password', default='password',
+                            help='Пароль всех созданных пользователей.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Строк в одном INSERT.')
+        parser.add_argument('--no-timelines', action='store_false',
+                            dest='timelines',
+                            help='Не собирать ленты подписок (можно '
+                                 'позже командой rebuild_timelines).')
+
+    def handle(self, *args, **options):
+        stats = dataset.generate(
+            users=options['users'], groups=options['groups'],
+            posts=options['posts'], comments=options['comments'],
+            follows=options['follows'], celebrities=options['celebrities'],
+            celebrity_share=options['celebrity_share'],
+            seed=options['seed'], prefix=options['prefix'],
+            password=options['password'], days=options['days'],
+            batch_size=options['batch_size'],
+            timelines=options['timelines'], log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Создано: ' + ', '.join(f'{model} {count}'
+                                    for model, count in stats.items())))
@@ -0,0 +1,45 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие миниатюры картинок постов '
+            'параллельно в нескольких процессах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Число процессов (по умолчанию по числу '
+                                 'ядер); 0 - в текущем процессе.')
+        parser.add_argument('--all', action='store_true',
+                            help='Проверить все картинки, а не только '
+                                 'те, у которых нет готовых миниатюр.')
+
+    def handle(self, *args, **options):
+        names = (Post.objects.exclude(image='').order_by()
+                 .values_list('image', flat=True).distinct())
+        backlog = [name for name in names.iterator()
+                   if options['all'] or not thumbnails.is_ready(name)]
+        if not backlog:
+            self.stdout.write(self.style.SUCCESS('Все миниатюры готовы'))
+            return
+        workers = options['workers']
+        if workers:
+            # Дочерние процессы открывают свои соединения с базой.
+            connections.close_all()
+            chunksize = max(len(backlog) // (workers * 4), 1)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                done = sum(pool.map(thumbnails.generate, backlog,
+                                    chunksize=chunksize))
+        else:
+            done = sum(map(thumbnails.generate, backlog))
+        failed = len(backlog) - done
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр для картинок: {done}'))
+        if failed:
+            self.stderr.write(f'Не удалось обработать картинок: {failed}')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow, TimelineEntry, User
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает материализованные ленты подписок '
+            'по таблице подписок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты нужно пересобрать '
+                 '(по умолчанию все, у кого есть подписки).'
+        )
+
+    def handle(self, *args, **options):
+        if options['usernames']:
+            user_ids = User.objects.filter(
+                username__in=options['usernames']
+            ).values_list('id', flat=True)
+        else:
+            # Ленты без подписок тоже пересобираются, то есть очищаются.
+            user_ids = sorted(
+                set(Follow.objects.values_list('user_id', flat=True))
+                | set(TimelineEntry.objects.values_list('user_id', flat=True)
+                      .distinct().order_by())
+            )
+        rebuilt = 0
+        for user_id in list(user_ids):
+            timeline.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {rebuilt}'))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики пачками '
+            'и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.COUNTERS_BATCH_SIZE,
+            help='Сколько строк пересчитывать за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed = {
+            'пользователи': counters.reconcile_users(batch_size),
+            'записи': counters.reconcile_posts(batch_size),
+            'сообщества': counters.reconcile_groups(batch_size),
+        }
+        for name, count in fixed.items():
+            self.stdout.write(f'{name}: исправлено {count}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
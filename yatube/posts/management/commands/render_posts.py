@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.rendering import RENDERED_FIELDS, render
+
+
+class Command(BaseCommand):
+    help = ('Заполняет готовый HTML текста и заголовка постов, '
+            'сохранённых до появления этих полей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.POST_RENDER_BATCH_SIZE,
+            help='Сколько постов обрабатывать за один проход.'
+        )
+        parser.add_argument(
+            '--all', action='store_true', dest='everything',
+            help='Перерисовать все посты, например после смены '
+                 'POST_WRAP_WIDTH.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if not options['everything']:
+            posts = posts.filter(rendered_text='').exclude(text='')
+        rendered = 0
+        last_id = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_id).order_by('pk')
+                         .only('pk', 'text')[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            for post in batch:
+                render(post)
+            Post.objects.bulk_update(batch, RENDERED_FIELDS)
+            rendered += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено постов: {rendered}'))
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = ('Обрезает материализованные ленты подписок до '
+            'TIMELINE_LENGTH записей (запускать по расписанию).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TIMELINE_BATCH_SIZE,
+            help='Сколько пользователей проверять за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        trimmed = timeline.trim_all(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обрезано лент: {trimmed}'))
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ('-created', '-id'), 'verbose_name': 'комментарий', 'verbose_name_plural': 'комментарии'},
+        ),
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'запись', 'verbose_name_plural': 'записи'},
+        ),
+        migrations.AlterModelOptions(
+            name='timelineentry',
+            options={'ordering': ('-pub_date', '-post_id'), 'verbose_name': 'запись ленты', 'verbose_name_plural': 'Ленты подписок'},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created', '-id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(group__isnull=False), fields=['group', '-pub_date', '-id'], name='post_group_pub_date_idx'),
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:10
+
+from django.db import migrations
+
+# SQL зафиксирован здесь, а не берётся из posts.search: миграция
+# должна создавать ту же схему, как бы ни менялся код поиска.
+# На прочих базах поиск работает без индекса.
+INSTALL = {
+    'postgresql': [
+        'ALTER TABLE posts_post ADD COLUMN IF NOT EXISTS search_vector '
+        'tsvector',
+        "UPDATE posts_post SET search_vector = "
+        "to_tsvector('pg_catalog.russian', coalesce(text, ''))",
+        'CREATE INDEX IF NOT EXISTS posts_post_search_idx '
+        'ON posts_post USING gin(search_vector)',
+        'DROP TRIGGER IF EXISTS posts_post_search_update ON posts_post',
+        'CREATE TRIGGER posts_post_search_update '
+        'BEFORE INSERT OR UPDATE OF text ON posts_post FOR EACH ROW '
+        "EXECUTE PROCEDURE tsvector_update_trigger(search_vector, "
+        "'pg_catalog.russian', text)",
+        'ALTER TABLE posts_group ADD COLUMN IF NOT EXISTS search_vector '
+        'tsvector',
+        "UPDATE posts_group SET search_vector = "
+        "to_tsvector('pg_catalog.russian', coalesce(title, ''))",
+        'CREATE INDEX IF NOT EXISTS posts_group_search_idx '
+        'ON posts_group USING gin(search_vector)',
+        'DROP TRIGGER IF EXISTS posts_group_search_update ON posts_group',
+        'CREATE TRIGGER posts_group_search_update '
+        'BEFORE INSERT OR UPDATE OF title ON posts_group FOR EACH ROW '
+        "EXECUTE PROCEDURE tsvector_update_trigger(search_vector, "
+        "'pg_catalog.russian', title)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING "
+        "fts5(text, content='posts_post', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        'CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert '
+        'AFTER INSERT ON posts_post BEGIN '
+        'INSERT INTO posts_post_fts(rowid, text) '
+        'VALUES (new.id, new.text); END',
+        'CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete '
+        'AFTER DELETE ON posts_post BEGIN '
+        "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); END",
+        'CREATE TRIGGER IF NOT EXISTS posts_post_fts_update '
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO posts_post_fts(rowid, text) '
+        'VALUES (new.id, new.text); END',
+        "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS posts_group_fts USING "
+        "fts5(title, content='posts_group', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        'CREATE TRIGGER IF NOT EXISTS posts_group_fts_insert '
+        'AFTER INSERT ON posts_group BEGIN '
+        'INSERT INTO posts_group_fts(rowid, title) '
+        'VALUES (new.id, new.title); END',
+        'CREATE TRIGGER IF NOT EXISTS posts_group_fts_delete '
+        'AFTER DELETE ON posts_group BEGIN '
+        "INSERT INTO posts_group_fts(posts_group_fts, rowid, title) "
+        "VALUES ('delete', old.id, old.title); END",
+        'CREATE TRIGGER IF NOT EXISTS posts_group_fts_update '
+        'AFTER UPDATE OF title ON posts_group BEGIN '
+        "INSERT INTO posts_group_fts(posts_group_fts, rowid, title) "
+        "VALUES ('delete', old.id, old.title); "
+        'INSERT INTO posts_group_fts(rowid, title) '
+        'VALUES (new.id, new.title); END',
+        "INSERT INTO posts_group_fts(posts_group_fts) VALUES ('rebuild')",
+    ],
+}
+
+DROP = {
+    'postgresql': [
+        'DROP TRIGGER IF EXISTS posts_post_search_update ON posts_post',
+        'ALTER TABLE posts_post DROP COLUMN IF EXISTS search_vector',
+        'DROP TRIGGER IF EXISTS posts_group_search_update ON posts_group',
+        'ALTER TABLE posts_group DROP COLUMN IF EXISTS search_vector',
+    ],
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+        'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+        'DROP TRIGGER IF EXISTS posts_post_fts_update',
+        'DROP TABLE IF EXISTS posts_post_fts',
+        'DROP TRIGGER IF EXISTS posts_group_fts_insert',
+        'DROP TRIGGER IF EXISTS posts_group_fts_delete',
+        'DROP TRIGGER IF EXISTS posts_group_fts_update',
+        'DROP TABLE IF EXISTS posts_group_fts',
+    ],
+}
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, ()):
+            schema_editor.execute(sql, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(INSTALL), run(DROP)),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='rendered_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML текста поста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='rendered_title',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML заголовка поста'),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import F, Q
+from django.utils.safestring import mark_safe
+
+from . import rendering
 
 User = get_user_model()
 
@@ -11,11 +14,15 @@ class Group(models.Model):
     - title - название сообщества;
     - slug - уникальный url адрес страницы сообщества;
     - description - описание сообщества;
+    - posts_count - счётчик сообщений сообщества (posts/counters.py);
     - функция __str__ переопределена и показывает название сообщества title.
     '''
     title = models.CharField(settings.GROUP_NAME, max_length=200)
     slug = models.SlugField(settings.URL_NAME, unique=True)
     description = models.TextField(settings.DESCRIPTION_NAME)
+    posts_count = models.PositiveIntegerField(
+        settings.POSTS_COUNT_NAME, default=0, editable=False
+    )
 
     class Meta:
         verbose_name = settings.GROUP_NAME
@@ -30,7 +37,12 @@ class Post(models.Model):
     - text - текст сообщения;
     - pub_date - дата публикации, по-умолчанию текущая;
     - author - автор (при удалении автора удаляются все сообщения)
-    - group - сообщество (группа) куда написаны посты, опционально.
+    - group - сообщество (группа) куда написаны посты, опционально;
+    - comments_count - счётчик комментариев (posts/counters.py);
+    - image_width, image_height, image_format, image_size, image_hash -
+      сведения о картинке, заполняются при загрузке (posts/images.py);
+    - rendered_text, rendered_title - готовый HTML текста и заголовка,
+      обновляются при записи поста (posts/rendering.py).
     '''
     text = models.TextField(settings.TEXT_NAME)
     pub_date = models.DateTimeField(settings.DATE_NAME, auto_now_add=True)
@@ -54,15 +66,65 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        settings.COMMENTS_COUNT_NAME, default=0, editable=False
+    )
+    image_width = models.PositiveIntegerField(
+        settings.IMAGE_WIDTH_NAME, null=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        settings.IMAGE_HEIGHT_NAME, null=True, editable=False
+    )
+    image_format = models.CharField(
+        settings.IMAGE_FORMAT_NAME, max_length=10, blank=True, editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        settings.IMAGE_SIZE_NAME, null=True, editable=False
+    )
+    image_hash = models.CharField(
+        settings.IMAGE_HASH_NAME, max_length=64, blank=True, editable=False
+    )
+    # Длина HTML не ограничена: теги в тексте заголовка не считаются.
+    rendered_text = models.TextField(
+        settings.RENDERED_TEXT_NAME, blank=True, editable=False
+    )
+    rendered_title = models.TextField(
+        settings.RENDERED_TITLE_NAME, blank=True, editable=False
+    )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = settings.POST_NAME
         verbose_name_plural = settings.POSTS_NAME
+        # Индексы повторяют сортировку лент (-pub_date, -id): главная,
+        # профиль автора и страница сообщества читаются по индексу
+        # без сортировки. Посты без сообщества в индекс сообществ
+        # не попадают.
+        indexes = [
+            models.Index(fields=('-pub_date', '-id'),
+                         name='post_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_pub_date_idx',
+                         condition=Q(group__isnull=False)),
+        ]
 
     def __str__(self):
         return(f'{self.text[:15]}')
 
+    @property
+    def text_html(self):
+        '''Готовый HTML текста; для постов до render_posts
+        отрисовывается на лету.'''
+        return mark_safe(self.rendered_text
+                         or rendering.render_text(self.text))
+
+    @property
+    def title_html(self):
+        return mark_safe(self.rendered_title
+                         or rendering.render_title(self.text))
+
 
 class Comment(models.Model):
     '''Модель комментария содержит поля:
@@ -87,9 +149,13 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ('-created',)
+        ordering = ('-created', '-id')
         verbose_name = settings.COMMENT_NAME
         verbose_name_plural = settings.COMMENTS_NAME
+        indexes = [
+            models.Index(fields=('post', '-created', '-id'),
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return(f'{self.text[:15]}')
@@ -125,6 +191,94 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=('user', 'author'),
                                     name='unique_following')
         ]
+        # Проверка подписки Follow(user, author) использует индекс
+        # уникального ограничения, подписчики автора - этот индекс.
+        indexes = [
+            models.Index(fields=('author', 'user'),
+                         name='follow_author_user_idx'),
+        ]
 
     def __str__(self):
         return(f'{self.user} => {self.author}')
+
+
+class UserStats(models.Model):
+    '''Модель счётчиков пользователя содержит поля:
+    - user - пользователь;
+    - posts_count - число его сообщений;
+    - followers_count - число его подписчиков;
+    - following_count - число авторов, на которых он подписан.
+    Счётчики обновляются при записи Post и Follow (posts/counters.py),
+    поэтому страницам не нужны запросы COUNT(*).
+    '''
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        settings.POSTS_COUNT_NAME, default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        settings.FOLLOWERS_COUNT_NAME, default=0
+    )
+    following_count = models.PositiveIntegerField(
+        settings.FOLLOWING_COUNT_NAME, default=0
+    )
+
+    class Meta:
+        verbose_name = settings.USER_STATS_NAME
+        verbose_name_plural = settings.USER_STATS_NAME
+
+    def __str__(self):
+        return(f'{self.user_id}: {self.posts_count}')
+
+
+class TimelineEntry(models.Model):
+    '''Модель записи в материализованной ленте подписок содержит поля:
+    - user - владелец ленты (подписчик);
+    - post - сообщение, попавшее в ленту;
+    - author - автор сообщения, нужен для очистки ленты при отписке;
+    - pub_date - копия даты публикации сообщения, ключ сортировки ленты.
+    Заполняется при публикации (fan-out on write), поэтому лента
+    подписок читается одним проходом по индексу (user, pub_date).
+    '''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name=settings.POST_NAME
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=settings.AUTHOR_NAME
+    )
+    pub_date = models.DateTimeField(settings.DATE_NAME)
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = settings.TIMELINE_NAME
+        verbose_name_plural = settings.TIMELINES_NAME
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=('user', 'author'),
+                         name='timeline_user_author_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_timeline_entry')
+        ]
+
+    def __str__(self):
+        return(f'{self.user} <= {self.post_id}')
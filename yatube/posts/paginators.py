@@ -0,0 +1,170 @@
+# posts/paginators.py
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Page
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    '''Упаковывает значения ключа сортировки в непрозрачный токен,
+    пригодный для передачи в адресной строке.
+    Даты сериализуются полностью, с микросекундами: иначе ключ
+    на границе страницы потеряет точность.'''
+    values = [value.isoformat() if isinstance(value, datetime.datetime)
+              else value for value in values]
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+SCALAR_TYPES = (str, int, float)
+
+
+def decode_cursor(token, length=None):
+    '''Распаковывает токен обратно в список значений.
+    Возвращает None, если токен повреждён, значения не скаляры
+    или их число не равно length.'''
+    try:
+        padding = '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + padding))
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if not isinstance(values, list):
+        return None
+    if length is not None and len(values) != length:
+        return None
+    # bool - подкласс int, но ключом сортировки не бывает.
+    if any(isinstance(value, bool) or not isinstance(value, SCALAR_TYPES)
+           for value in values):
+        return None
+    return values
+
+
+class CursorPage(Page):
+    '''Страница курсорного паджинатора. Совместима с Page по интерфейсу
+    итерации, но не знает своего номера и общего числа страниц:
+    переход выполняется по токенам next_cursor и previous_cursor.'''
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def start_index(self):
+        return 1 if self.object_list else 0
+
+    def end_index(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    '''Паджинатор по ключу (keyset), по умолчанию (pub_date, id).
+
+    Вместо OFFSET и COUNT(*) выбирает строки строго после (after) или
+    строго до (before) ключа крайнего элемента соседней страницы,
+    поэтому время выборки не зависит от глубины страницы.
+    Ключи задаются как в order_by(): знак "-" означает убывание.
+    Последний ключ должен быть уникальным.
+    Номеров страниц и их числа нет, поэтому это не наследник
+    Paginator: страница выбирается только get_page(after, before).
+    '''
+
+    def __init__(self, object_list, per_page, keys=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = tuple(keys)
+
+    def _fields(self):
+        return [key.lstrip('-') for key in self.keys]
+
+    def _reversed_keys(self):
+        return [key[1:] if key.startswith('-') else f'-{key}'
+                for key in self.keys]
+
+    def _output_field(self, field):
+        try:
+            return self.object_list.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            # Аннотированное поле (например, ранг поиска).
+            return self.object_list.query.annotations[field].output_field
+
+    def _to_python(self, field, value):
+        '''Значение ключа из токена в типе поля; None, если тип
+        не подходит (токен подделан или от другой ленты).'''
+        try:
+            return self._output_field(field).to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            return None
+
+    def _decode(self, token):
+        values = decode_cursor(token, len(self.keys)) if token else None
+        if values is None:
+            return None
+        values = [self._to_python(field, value)
+                  for field, value in zip(self._fields(), values)]
+        if any(value is None for value in values):
+            return None
+        return values
+
+    def _seek(self, values, forward):
+        '''Условие "строка лежит после ключа values" в направлении
+        сортировки (forward) или против него.'''
+        condition = Q()
+        for position, key in enumerate(self.keys):
+            field = key.lstrip('-')
+            descending = key.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[position]})
+            for prev_field, prev_value in zip(self._fields()[:position],
+                                              values[:position]):
+                step &= Q(**{prev_field: prev_value})
+            condition |= step
+        return condition
+
+    def cursor_for(self, obj):
+        return encode_cursor([getattr(obj, field)
+                              for field in self._fields()])
+
+    def get_page(self, after=None, before=None):
+        '''Возвращает CursorPage. Повреждённый токен трактуется как
+        отсутствующий, как это делает Paginator.get_page для номера.'''
+        after_values = self._decode(after)
+        before_values = None if after_values else self._decode(before)
+        limit = self.per_page + 1
+        if before_values is not None:
+            rows = list(
+                self.object_list
+                .filter(self._seek(before_values, forward=False))
+                .order_by(*self._reversed_keys())[:limit]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.object_list.order_by(*self.keys)
+            if after_values is not None:
+                queryset = queryset.filter(
+                    self._seek(after_values, forward=True))
+            rows = list(queryset[:limit])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = after_values is not None
+        next_cursor = (self.cursor_for(rows[-1])
+                       if has_next and rows else None)
+        previous_cursor = (self.cursor_for(rows[0])
+                           if has_previous and rows else None)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
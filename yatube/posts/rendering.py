@@ -0,0 +1,34 @@
+# posts/rendering.py
+'''Готовый HTML текста и заголовка поста.
+
+Текст поста переносится по POST_WRAP_WIDTH символов, экранируется,
+и переводы строк заменяются на <br>; заголовок страницы поста -
+первые POST_TITLE_LENGTH символов. Результат сохраняется в посте при
+записи (posts/signals.py), поэтому ленты выводят готовый HTML, и время
+отрисовки не зависит от длины постов. Посты, сохранённые до появления
+этих полей, заполняет команда render_posts.
+'''
+from django.conf import settings
+from django.template.defaultfilters import (linebreaksbr,
+                                            truncatechars_html, wordwrap)
+from django.utils.html import conditional_escape
+
+RENDERED_FIELDS = ('rendered_text', 'rendered_title')
+
+
+def render_text(text):
+    '''То же, что {{ text|wordwrap:120|linebreaksbr }} в шаблоне.'''
+    return str(linebreaksbr(wordwrap(text, settings.POST_WRAP_WIDTH),
+                            autoescape=True))
+
+
+def render_title(text):
+    '''То же, что {{ text|truncatechars_html:30 }} в шаблоне.'''
+    return str(conditional_escape(
+        truncatechars_html(text, settings.POST_TITLE_LENGTH)))
+
+
+def render(post):
+    '''Заполняет готовый HTML поста по его тексту.'''
+    post.rendered_text = render_text(post.text)
+    post.rendered_title = render_title(post.text)
@@ -0,0 +1,170 @@
+# posts/search.py
+'''Полнотекстовый поиск по текстам постов и названиям сообществ.
+
+Индекс поддерживается самой базой (миграция 0005_search), поэтому
+запись через ORM, bulk_create или админку не требует отдельного шага:
+- PostgreSQL: столбец search_vector типа tsvector, GIN-индекс по нему
+  и триггер, пересчитывающий вектор при вставке и изменении текста;
+- SQLite: внешняя (external content) таблица FTS5 с триггерами.
+На прочих базах поиск сводится к icontains без ранжирования.
+
+Результат - QuerySet с аннотацией rank (чем больше, тем релевантнее),
+пригодный для CursorPaginator с ключами SEARCH_KEYS.
+'''
+from django.db import connections, router
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Group, Post
+
+SEARCH_KEYS = ('-rank', '-id')
+
+# Конфигурация текстового поиска PostgreSQL (словарь и стемминг).
+# Та же, с которой миграция 0005_search строит векторы и триггеры:
+# сменить её можно только новой миграцией, пересчитывающей индекс.
+SEARCH_CONFIG = 'pg_catalog.russian'
+
+# Модель -> (таблица, индексируемый столбец).
+INDEXED = {
+    Post: ('posts_post', 'text'),
+    Group: ('posts_group', 'title'),
+}
+
+
+def _postgresql_index(table, column):
+    config = SEARCH_CONFIG
+    return [
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector '
+        f'tsvector',
+        f"UPDATE {table} SET search_vector = "
+        f"to_tsvector('{config}', coalesce({column}, ''))",
+        f'CREATE INDEX IF NOT EXISTS {table}_search_idx '
+        f'ON {table} USING gin(search_vector)',
+        f'DROP TRIGGER IF EXISTS {table}_search_update ON {table}',
+        f'CREATE TRIGGER {table}_search_update '
+        f'BEFORE INSERT OR UPDATE OF {column} ON {table} FOR EACH ROW '
+        f"EXECUTE PROCEDURE tsvector_update_trigger(search_vector, "
+        f"'{config}', {column})",
+    ]
+
+
+def _sqlite_triggers(table, column):
+    fts = f'{table}_fts'
+    remove = (f"INSERT INTO {fts}({fts}, rowid, {column}) "
+              f"VALUES ('delete', old.id, old.{column});")
+    add = f'INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});'
+    return {
+        f'{fts}_insert': f'AFTER INSERT ON {table} BEGIN {add} END',
+        f'{fts}_delete': f'AFTER DELETE ON {table} BEGIN {remove} END',
+        f'{fts}_update': (f'AFTER UPDATE OF {column} ON {table} '
+                          f'BEGIN {remove} {add} END'),
+    }
+
+
+def install_index(connection):
+    '''Создаёт полнотекстовые индексы и триггеры на connection.
+    Повторный вызов безопасен. На SQLite пересборка таблицы при
+    изменении схемы (ALTER) удаляет её триггеры, поэтому недостающие
+    триггеры создаются заново, а индекс перестраивается.'''
+    with connection.cursor() as cursor:
+        for table, column in INDEXED.values():
+            if connection.vendor == 'postgresql':
+                for sql in _postgresql_index(table, column):
+                    cursor.execute(sql)
+            elif connection.vendor == 'sqlite':
+                fts = f'{table}_fts'
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING '
+                    f"fts5({column}, content='{table}', content_rowid='id', "
+                    f"tokenize='unicode61 remove_diacritics 2')")
+                triggers = _sqlite_triggers(table, column)
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                    f"AND tbl_name = '{table}'")
+                existing = {name for name, in cursor.fetchall()}
+                if existing.issuperset(triggers):
+                    continue
+                for name, body in triggers.items():
+                    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS '
+                                   f'{name} {body}')
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_triggers(connection):
+    '''Удаляет триггеры индекса SQLite перед массовой загрузкой:
+    без них вставка в разы быстрее. install_index вернёт их
+    и перестроит индекс одним проходом. Возвращает False, если
+    удалять нечего: на PostgreSQL триггер заполняет векторы при
+    загрузке, и перестраивать индекс после неё не нужно.'''
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        for table, column in INDEXED.values():
+            for name in _sqlite_triggers(table, column):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    return True
+
+
+def fts5_query(query):
+    '''Запрос пользователя в синтаксисе FTS5: каждое слово в кавычках
+    (операторы и спецсимволы не интерпретируются) и с поиском
+    по префиксу, все слова обязательны.'''
+    return ' '.join('"{}"*'.format(term.replace('"', '""'))
+                    for term in query.split())
+
+
+def _postgresql(queryset, table, query):
+    tsquery = 'plainto_tsquery(%s::regconfig, %s)'
+    params = [SEARCH_CONFIG, query]
+    # float8: ранг без потери точности переживает токен курсора.
+    rank = RawSQL(f'ts_rank({table}.search_vector, {tsquery})::float8',
+                  params, output_field=FloatField())
+    return queryset.annotate(rank=rank).extra(
+        where=[f'{table}.search_vector @@ {tsquery}'], params=params)
+
+
+def _sqlite(queryset, table, query):
+    fts = f'{table}_fts'
+    match = fts5_query(query)
+    # bm25() тем меньше, чем релевантнее строка.
+    rank = RawSQL(f'SELECT -bm25({fts}) FROM {fts} '
+                  f'WHERE {fts} MATCH %s AND rowid = {table}.id', [match],
+                  output_field=FloatField())
+    # Не filter(id__in=RawSQL(...)): SQLite читает "IN ((SELECT ...))"
+    # как скалярный подзапрос и берёт только первую строку.
+    return queryset.annotate(rank=rank).extra(
+        where=[f'{table}.id IN (SELECT rowid FROM {fts} '
+               f'WHERE {fts} MATCH %s)'], params=[match])
+
+
+def _fallback(queryset, column, query):
+    return queryset.annotate(
+        rank=Value(0.0, output_field=FloatField())
+    ).filter(**{f'{column}__icontains': query})
+
+
+def search(model, query):
+    '''QuerySet объектов model, подходящих под запрос query,
+    с аннотацией rank. Пустой запрос ничего не находит.'''
+    table, column = INDEXED[model]
+    query = query.strip()
+    if not query:
+        return model.objects.annotate(
+            rank=Value(0.0, output_field=FloatField())).none()
+    queryset = model.objects.all()
+    vendor = connections[router.db_for_read(model)].vendor
+    if vendor == 'postgresql':
+        return _postgresql(queryset, table, query)
+    if vendor == 'sqlite':
+        return _sqlite(queryset, table, query)
+    return _fallback(queryset, column, query)
+
+
+def search_posts(query):
+    '''Посты по тексту, от самых релевантных.'''
+    return search(Post, query).order_by(*SEARCH_KEYS)
+
+
+def search_groups(query):
+    '''Сообщества по названию, от самых релевантных.'''
+    return search(Group, query).order_by(*SEARCH_KEYS)
@@ -0,0 +1,146 @@
+# posts/signals.py
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import caching, counters, images, rendering, search, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Поля, которые выводятся на страницах других объектов.
+DISPLAY_FIELDS = {
+    User: ('username', 'first_name', 'last_name'),
+    Group: ('title', 'slug', 'description'),
+}
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    '''У нового пользователя сразу есть строка счётчиков.'''
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Group)
+def display_changing(sender, instance, update_fields=None, **kwargs):
+    '''Запоминает, меняются ли выводимые на других страницах поля:
+    вход пользователя (update_fields=['last_login']) их не трогает.'''
+    fields = DISPLAY_FIELDS[sender]
+    instance._display_changed = False
+    if instance.pk is None or (update_fields is not None
+                               and not set(fields) & set(update_fields)):
+        return
+    previous = (sender.objects.filter(pk=instance.pk)
+                .values_list(*fields).first())
+    instance._display_changed = previous != tuple(
+        getattr(instance, field) for field in fields)
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, **kwargs):
+    if getattr(instance, '_display_changed', False):
+        caching.bump_user_display_version(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, **kwargs):
+    if getattr(instance, '_display_changed', False):
+        caching.bump_group_display_version(instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    '''Посты удаляемого сообщества остаются без него.'''
+    caching.bump_group_display_version(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    '''Запоминает прежнее сообщество поста, чтобы перенести счётчик.'''
+    instance._previous_group_id = None
+    if instance.pk is not None:
+        instance._previous_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(pre_save, sender=Post)
+def post_image_uploaded(sender, instance, **kwargs):
+    '''Сохраняет сведения о новой картинке, пока файл под рукой.'''
+    images.fill_metadata(instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_text_changing(sender, instance, **kwargs):
+    '''Сохраняет готовый HTML текста вместе с постом.'''
+    rendering.render(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_published(sender, instance, created, **kwargs):
+    '''Новый пост попадает в ленты подписчиков автора
+    и в счётчики автора и сообщества; любая запись поста
+    сбрасывает кэш главной, лент подписчиков автора и ETag
+    страницы сообщества.'''
+    caching.bump_index_version()
+    caching.bump_author_version(instance.author_id)
+    caching.bump_group_version(instance.group_id)
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        counters.bump_group(instance.group_id, 1)
+        timeline.fan_out_post(instance)
+    elif instance._previous_group_id != instance.group_id:
+        caching.bump_group_version(instance._previous_group_id)
+        counters.bump_group(instance._previous_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    caching.bump_index_version()
+    caching.bump_author_version(instance.author_id)
+    caching.bump_group_version(instance.group_id)
+    counters.bump_user(instance.author_id, posts_count=-1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    '''Подписка добавляет в ленту последние посты автора.'''
+    if created:
+        caching.bump_follows_version(instance.user_id)
+        counters.bump_user(instance.user_id, following_count=1)
+        counters.bump_user(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    '''Отписка убирает посты автора из ленты.'''
+    caching.bump_follows_version(instance.user_id)
+    counters.bump_user(instance.user_id, following_count=-1)
+    counters.bump_user(instance.author_id, followers_count=-1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_migrate)
+def search_index_checked(sender, using, **kwargs):
+    # На SQLite миграции, меняющие таблицу постов или сообществ,
+    # пересоздают её без триггеров полнотекстового индекса.
+    connection = connections[using]
+    if (sender.name == 'posts' and connection.vendor == 'sqlite'
+            and 'posts_post_fts' in connection.introspection.table_names()):
+        search.install_index(connection)
@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..cards import render_card
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post):
+    '''Карточка поста: готовая из cards.attach или, если лента
+    загружена не через load_feed, отрисованная на месте.'''
+    card = getattr(post, 'card', None)
+    if card is None:
+        card = render_card(post)
+    return mark_safe(card)
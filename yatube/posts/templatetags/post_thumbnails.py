@@ -0,0 +1,16 @@
+from django import template
+
+from ..thumbnails import picture, schedule
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_picture(image):
+    '''Готовые миниатюры картинки для <picture> или None, если
+    карточки ещё нет: тогда шаблон выводит заглушку. Недостающие
+    миниатюры ставятся в очередь на генерацию.'''
+    result = picture(image) if image else None
+    if image and (result is None or not result['complete']):
+        schedule(image)
+    return result
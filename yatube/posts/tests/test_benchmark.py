@@ -0,0 +1,57 @@
+# posts/tests/test_benchmark.py
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Follow, Group, Post, User
+
+# CON - CONSTANTS
+CON = {
+    'AUTHOR_NAME': 'author',
+    'READER_NAME': 'reader',
+    'GROUP_SLUG': 'test-slug',
+    'POST_TEXT': 'Тестовый текст',
+    'VIEWS': ('index', 'group_posts', 'profile', 'post_detail',
+              'follow_index', 'post_create', 'add_comment'),
+}
+
+
+class BenchmarkCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username=CON['AUTHOR_NAME'])
+        reader = User.objects.create_user(username=CON['READER_NAME'])
+        group = Group.objects.create(title=CON['GROUP_SLUG'],
+                                     slug=CON['GROUP_SLUG'])
+        Post.objects.create(author=author, group=group, text=CON['POST_TEXT'])
+        Follow.objects.create(user=reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'benchmark.json')
+
+    def test_results_are_saved(self):
+        '''Команда проходит все представления без ошибок и дописывает
+        прогоны с задержками и пропускной способностью в JSON.'''
+        for label in ('before', 'after'):
+            call_command('benchmark', concurrency=1, requests=3, warmup=1,
+                         label=label, output=self.output, stdout=StringIO())
+        with open(self.output) as file:
+            runs = json.load(file)
+        self.assertEqual([run['label'] for run in runs], ['before', 'after'])
+        views = runs[-1]['views']
+        self.assertEqual(set(views), set(CON['VIEWS']))
+        for view, result in views.items():
+            with self.subTest(view=view):
+                self.assertEqual(result['requests'], 3)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['rps'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
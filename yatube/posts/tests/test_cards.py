@@ -0,0 +1,82 @@
+# posts/tests/test_cards.py
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import cards
+from ..models import Group, Post, User
+
+# CON - CONSTANTS
+CON = {
+    'USER_NAME': 'user_1',
+    'GROUP_SLUG': 'test-slug',
+    'POSTS': 3,
+    'NEW_TEXT': 'Исправленный текст',
+    'NEW_NAME': 'Новое имя',
+    # Картинка без миниатюр: карточка выводит заглушку.
+    'IMAGE': 'posts/pending.jpg',
+}
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=CON['USER_NAME'])
+        cls.group = Group.objects.create(title='Сообщество',
+                                         slug=CON['GROUP_SLUG'])
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Запись {i}')
+            for i in range(CON['POSTS'])
+        ]
+        cls.url = reverse('posts:group_list', args=(CON['GROUP_SLUG'],))
+
+    def setUp(self):
+        cache.clear()
+
+    def rendered_cards(self):
+        '''Сколько карточек отрисовано заново при открытии страницы.'''
+        with mock.patch.object(cards, 'render_card',
+                               wraps=cards.render_card) as render_card:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.response = response
+        return render_card.call_count
+
+    def test_cards_come_from_cache(self):
+        '''Повторная страница берёт все карточки из кэша одним
+        get_many.'''
+        self.assertEqual(self.rendered_cards(), CON['POSTS'])
+        with mock.patch.object(cards.cache, 'get_many',
+                               wraps=cards.cache.get_many) as get_many:
+            self.assertEqual(self.rendered_cards(), 0)
+        card_calls = [keys for (keys,), _ in get_many.call_args_list
+                      if keys[0].startswith('posts:card:')]
+        self.assertEqual(len(card_calls), 1)
+        self.assertEqual(len(card_calls[0]), CON['POSTS'])
+        self.assertContains(self.response, self.posts[0].text)
+
+    def test_edits_change_card(self):
+        '''Правка поста перерисовывает только его карточку, смена
+        имени автора - все его карточки.'''
+        self.rendered_cards()
+        post = Post.objects.get(pk=self.posts[0].pk)
+        post.text = CON['NEW_TEXT']
+        post.save()
+        self.assertEqual(self.rendered_cards(), 1)
+        self.assertContains(self.response, CON['NEW_TEXT'])
+        User.objects.filter(pk=self.author.pk).update(
+            first_name=CON['NEW_NAME'])
+        self.assertEqual(self.rendered_cards(), CON['POSTS'])
+        self.assertContains(self.response, CON['NEW_NAME'],
+                            count=CON['POSTS'])
+
+    def test_pending_thumbnail_is_not_cached(self):
+        '''Карточка с заглушкой вместо картинки не кэшируется.'''
+        Post.objects.filter(pk=self.posts[0].pk).update(image=CON['IMAGE'])
+        with self.settings(THUMBNAIL_WORKERS=2):
+            self.rendered_cards()
+            self.assertEqual(self.rendered_cards(), 1)
@@ -0,0 +1,125 @@
+# posts/tests/test_counters.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+# CON - CONSTANTS
+CON = {
+    'GROUP_1_SLUG': 'test-slug',
+    'GROUP_2_SLUG': 'best-slug',
+    'GROUP_TITLE': 'Тестовая группа',
+    'GROUP_DESCRIPTION': 'Тестовое описание группы',
+    'POST_TEXT': 'Тестовый текст',
+    'COMMENT_TEXT': 'Тестовый комментарий',
+    'USER_1_NAME': 'user_1',
+    'USER_2_NAME': 'user_2',
+    'USER_3_NAME': 'user_3',
+}
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=CON['USER_1_NAME'])
+        cls.reader = User.objects.create_user(username=CON['USER_2_NAME'])
+        cls.authorized_author = Client()
+        cls.authorized_author.force_login(cls.author)
+        cls.group = Group.objects.create(
+            title=CON['GROUP_TITLE'],
+            slug=CON['GROUP_1_SLUG'],
+            description=CON['GROUP_DESCRIPTION'],
+        )
+        cls.group_2 = Group.objects.create(
+            title=CON['GROUP_TITLE'],
+            slug=CON['GROUP_2_SLUG'],
+            description=CON['GROUP_DESCRIPTION'],
+        )
+
+    def counters(self):
+        author = UserStats.objects.get(user=self.author)
+        reader = UserStats.objects.get(user=self.reader)
+        return {
+            'author_posts': author.posts_count,
+            'author_followers': author.followers_count,
+            'reader_following': reader.following_count,
+            'group': Group.objects.get(pk=self.group.pk).posts_count,
+            'group_2': Group.objects.get(pk=self.group_2.pk).posts_count,
+        }
+
+    def test_counters_follow_writes(self):
+        '''Счётчики меняются при создании, переносе и удалении
+        постов, комментариев и подписок.'''
+        response = self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={'text': CON['POST_TEXT'], 'group': self.group.pk}
+        )
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get()
+        Comment.objects.create(post=post, author=self.reader,
+                               text=CON['COMMENT_TEXT'])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(), {
+            'author_posts': 1, 'author_followers': 1,
+            'reader_following': 1, 'group': 1, 'group_2': 0,
+        })
+        self.assertEqual(Post.objects.get().comments_count, 1)
+
+        self.authorized_author.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': CON['POST_TEXT'], 'group': self.group_2.pk}
+        )
+        self.assertEqual(self.counters()['group_2'], 1)
+        self.assertEqual(self.counters()['group'], 0)
+
+        Follow.objects.all().delete()
+        post.refresh_from_db()
+        post.delete()
+        self.assertEqual(self.counters(), {
+            'author_posts': 0, 'author_followers': 0,
+            'reader_following': 0, 'group': 0, 'group_2': 0,
+        })
+
+    def test_user_delete(self):
+        '''Удаление автора, подписчика и того, на кого подписаны,
+        не создаёт заново его строку счётчиков.'''
+        user = User.objects.create_user(username=CON['USER_3_NAME'])
+        Post.objects.create(author=user, group=self.group,
+                            text=CON['POST_TEXT'])
+        Follow.objects.create(user=user, author=self.author)
+        Follow.objects.create(user=self.reader, author=user)
+        user.delete()
+        self.assertFalse(UserStats.objects.filter(
+            user__username=CON['USER_3_NAME']).exists())
+        self.assertEqual(self.counters(), {
+            'author_posts': 0, 'author_followers': 0,
+            'reader_following': 0, 'group': 0, 'group_2': 0,
+        })
+
+    def test_reconcile_fixes_drift(self):
+        '''reconcile_counters восстанавливает сбитые счётчики.'''
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text=CON['POST_TEXT'])
+        Comment.objects.create(post=post, author=self.reader,
+                               text=CON['COMMENT_TEXT'])
+        UserStats.objects.all().delete()
+        Post.objects.update(comments_count=7)
+        Group.objects.update(posts_count=7)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.counters()['author_posts'], 1)
+        self.assertEqual(self.counters()['group'], 1)
+        self.assertEqual(self.counters()['group_2'], 0)
+        self.assertEqual(Post.objects.get().comments_count, 1)
+
+    def test_counters_in_templates(self):
+        '''Профиль показывает счётчики без запросов COUNT(*).'''
+        Post.objects.create(author=self.author, text=CON['POST_TEXT'])
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.author}))
+        self.assertEqual(response.context['stats'].posts_count, 1)
+        self.assertEqual(response.context['stats'].followers_count, 1)
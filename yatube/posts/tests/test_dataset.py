@@ -0,0 +1,69 @@
+# posts/tests/test_dataset.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import dataset, timeline
+from ..models import Comment, Follow, Post, TimelineEntry, User, UserStats
+from ..search import search_posts
+
+# CON - CONSTANTS
+CON = {
+    'SIZES': {'users': 30, 'groups': 3, 'posts': 200, 'comments': 100,
+              'follows': 4, 'celebrities': 2, 'celebrity_share': 0.5},
+    'SEED': 7,
+}
+
+
+def snapshot(prefix):
+    '''Созданные строки без префикса имён - для сравнения прогонов.'''
+    def name(username):
+        return username[len(prefix):]
+
+    users = User.objects.filter(username__startswith=prefix)
+    return {
+        'users': list(users.order_by('username')
+                      .values_list('first_name', 'date_joined')),
+        'posts': [(name(username), text, pub_date)
+                  for username, text, pub_date
+                  in Post.objects.filter(author__in=users).order_by('id')
+                  .values_list('author__username', 'text', 'pub_date')],
+        'follows': sorted(
+            (name(user), name(author)) for user, author
+            in Follow.objects.filter(user__in=users)
+            .values_list('user__username', 'author__username')),
+    }
+
+
+class GenerateDatasetTests(TestCase):
+    def test_same_seed_same_data(self):
+        '''Тот же seed даёт те же пользователи, посты и подписки.'''
+        for prefix in ('a', 'b'):
+            dataset.generate(seed=CON['SEED'], prefix=prefix,
+                             **CON['SIZES'])
+        self.assertEqual(snapshot('a'), snapshot('b'))
+        dataset.generate(seed=CON['SEED'] + 1, prefix='c', **CON['SIZES'])
+        self.assertNotEqual(snapshot('a'), snapshot('c'))
+
+    def test_derived_data_is_consistent(self):
+        '''Счётчики, ленты подписок и поиск соответствуют созданным
+        строкам; у знаменитостей больше всего подписчиков.'''
+        call_command('generate_dataset', seed=CON['SEED'], stdout=StringIO(),
+                     **CON['SIZES'])
+        self.assertEqual(Post.objects.count(), CON['SIZES']['posts'])
+        self.assertEqual(Comment.objects.count(), CON['SIZES']['comments'])
+        stats = UserStats.objects.order_by('-followers_count').first()
+        self.assertEqual(stats.followers_count,
+                         Follow.objects.filter(author=stats.user).count())
+        self.assertGreaterEqual(stats.followers_count,
+                                CON['SIZES']['users'] // 4)
+        follower = Follow.objects.values_list('user_id', flat=True).first()
+        generated = list(TimelineEntry.objects.filter(user_id=follower)
+                         .values_list('post_id', 'pub_date'))
+        timeline.rebuild(follower)
+        self.assertEqual(generated, list(
+            TimelineEntry.objects.filter(user_id=follower)
+            .values_list('post_id', 'pub_date')))
+        word = Post.objects.first().text.split()[0]
+        self.assertTrue(search_posts(word).exists())
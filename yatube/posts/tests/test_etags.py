@@ -0,0 +1,142 @@
+# posts/tests/test_etags.py
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+# CON - CONSTANTS
+CON = {
+    'GROUP_SLUG': 'test-slug',
+    'GROUP_TITLE': 'Тестовая группа',
+    'GROUP_DESCRIPTION': 'Тестовое описание группы',
+    'POST_TEXT': 'Тестовый текст',
+    'AUTHOR_NAME': 'author',
+    'READER_NAME': 'reader',
+    'OTHER_SLUG': 'other-slug',
+    'NEW_NAME': 'Новое имя',
+}
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=CON['AUTHOR_NAME'])
+        cls.reader = User.objects.create_user(username=CON['READER_NAME'])
+        cls.group = Group.objects.create(
+            title=CON['GROUP_TITLE'],
+            slug=CON['GROUP_SLUG'],
+            description=CON['GROUP_DESCRIPTION'],
+        )
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text=CON['POST_TEXT'])
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.author.username,)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def etag(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_pages_get_304(self):
+        '''Повторный запрос с тем же ETag получает 304 без отрисовки.'''
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.etag(url)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(response.templates)
+
+    def test_writes_change_etag(self):
+        '''Новый пост, комментарий и подписка меняют ETag зависящих
+        от них страниц.'''
+        writes = (
+            (lambda: Post.objects.create(author=self.author,
+                                         group=self.group,
+                                         text=CON['POST_TEXT']),
+             self.urls),
+            (lambda: Comment.objects.create(post=self.post,
+                                            author=self.reader,
+                                            text=CON['POST_TEXT']),
+             self.urls[3:]),
+            (lambda: Follow.objects.create(user=self.reader,
+                                           author=self.author),
+             self.urls[2:3]),
+        )
+        for write, urls in writes:
+            etags = {url: self.etag(url) for url in urls}
+            write()
+            for url in urls:
+                with self.subTest(url=url):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etags[url])
+                    self.assertEqual(response.status_code, 200)
+
+    def assertChanged(self, write, urls, changed=True):
+        etags = {url: self.etag(url) for url in urls}
+        write()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url,
+                                           HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code,
+                                 200 if changed else 304)
+
+    def test_group_etag_ignores_other_groups(self):
+        '''Пост в другом сообществе не меняет ETag этого.'''
+        other = Group.objects.create(title=CON['GROUP_TITLE'],
+                                     slug=CON['OTHER_SLUG'])
+        self.assertChanged(
+            lambda: Post.objects.create(author=self.reader, group=other,
+                                        text=CON['POST_TEXT']),
+            self.urls[1:2], changed=False)
+
+    def test_display_changes_change_etag(self):
+        '''Правка имени автора, комментатора или сообщества меняет
+        ETag страниц, где они выводятся; вход пользователя - нет.'''
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text=CON['POST_TEXT'])
+
+        def rename(obj, field):
+            obj = type(obj).objects.get(pk=obj.pk)
+            setattr(obj, field, CON['NEW_NAME'])
+            obj.save()
+
+        self.assertChanged(lambda: rename(self.author, 'first_name'),
+                           self.urls)
+        self.assertChanged(lambda: rename(self.reader, 'username'),
+                           self.urls[3:])
+        self.assertChanged(lambda: rename(self.group, 'title'),
+                           self.urls)
+        self.assertChanged(lambda: self.client.force_login(self.reader),
+                           self.urls, changed=False)
+
+    def test_etag_depends_on_viewer_and_page(self):
+        '''У гостя, у другого пользователя и на другой странице ETag
+        свой.'''
+        url = self.urls[0]
+        etag = self.etag(url)
+        self.assertNotEqual(etag, self.etag(url, Client()))
+        self.assertNotEqual(etag, self.etag(f'{url}?page=2'))
+
+    def test_missing_objects_return_404(self):
+        '''Без объекта ETag не считается, страница отвечает 404.'''
+        urls = (
+            reverse('posts:group_list', args=('missing',)),
+            reverse('posts:profile', args=('missing',)),
+            reverse('posts:post_detail', args=(self.post.pk + 100,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='"x"')
+                self.assertEqual(response.status_code, 404)
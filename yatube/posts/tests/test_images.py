@@ -0,0 +1,167 @@
+# posts/tests/test_images.py
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from PIL import Image
+
+from ..models import Post, User
+
+# CON - CONSTANTS
+CON = {
+    'USER_NAME': 'user_1',
+    'POST_TEXT': 'Тестовый текст',
+    'SMALL_GIF': (
+        b'\x47\x49\x46\x38\x39\x61\x02\x00'
+        b'\x01\x00\x80\x00\x00\x00\x00\x00'
+        b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+        b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+        b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+        b'\x0A\x00\x3B'
+    )
+}
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png(size, name='big.png'):
+    file = BytesIO()
+    Image.new('RGB', size, color=(0, 128, 255)).save(file, 'PNG')
+    return SimpleUploadedFile(name, file.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=CON['USER_NAME'])
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear_local()
+
+    def upload(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': CON['POST_TEXT'],
+                  'image': SimpleUploadedFile('small.gif', CON['SMALL_GIF'],
+                                              content_type='image/gif')}
+        )
+        return Post.objects.get(author=self.user)
+
+    def test_metadata_saved_on_upload(self):
+        '''При загрузке картинки сохраняются её размеры, формат,
+        объём и хеш; правка текста их не сбрасывает.'''
+        post = self.upload()
+        expected = {
+            'image_width': 2,
+            'image_height': 1,
+            'image_format': 'GIF',
+            'image_size': len(CON['SMALL_GIF']),
+            'image_hash': hashlib.sha256(CON['SMALL_GIF']).hexdigest(),
+        }
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(post, field), value)
+        post.text = 'Новый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image_width, expected['image_width'])
+
+    def test_backfill_command(self):
+        '''Команда заполняет сведения о ранее загруженных картинках
+        и пропускает посты с потерянными файлами.'''
+        name = default_storage.save('posts/old.gif',
+                                    ContentFile(CON['SMALL_GIF']))
+        old = Post.objects.create(author=self.user, text=CON['POST_TEXT'],
+                                  image=name)
+        lost = Post.objects.create(author=self.user, text=CON['POST_TEXT'],
+                                   image='posts/lost.gif')
+        self.assertIsNone(old.image_width)
+        err = StringIO()
+        call_command('backfill_image_metadata', batch_size=1,
+                     stdout=StringIO(), stderr=err)
+        old.refresh_from_db()
+        lost.refresh_from_db()
+        self.assertEqual((old.image_width, old.image_height), (2, 1))
+        self.assertEqual(lost.image_hash, '')
+        self.assertIn('1', err.getvalue())
+
+    def test_feed_does_not_touch_media_files(self):
+        '''Лента с готовыми миниатюрами отрисовывается без обращений
+        к файлам и выводит размеры картинки.'''
+        self.upload()
+        cache.clear()
+        forbidden = mock.Mock(side_effect=AssertionError('обращение к файлу'))
+        with mock.patch.multiple(FileSystemStorage, open=forbidden,
+                                 exists=forbidden, size=forbidden,
+                                 path=forbidden):
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'width="960" height="339"')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+                   IMAGE_PROCESS_WORKERS=0)
+class ImageUploadLimitsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=CON['USER_NAME'])
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': CON['POST_TEXT'], 'image': image}
+        )
+
+    def test_limits_reject_upload(self):
+        '''Слишком большой по объёму или по числу пикселей файл
+        отклоняется с ошибкой поля, пост не создаётся.'''
+        cases = (
+            ({'IMAGE_UPLOAD_MAX_BYTES': 100}, 'too_big'),
+            ({'IMAGE_MAX_PIXELS': 100}, 'too_many_pixels'),
+        )
+        for limits, code in cases:
+            with self.subTest(code=code), override_settings(**limits):
+                response = self.create(png((50, 50)))
+                form = response.context['form']
+                self.assertTrue(form.has_error('image', code))
+                self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_SIDE=10)
+    def test_large_image_is_downscaled(self):
+        '''Картинка больше IMAGE_MAX_SIDE уменьшается после загрузки,
+        сведения о ней обновляются.'''
+        self.create(png((50, 30)))
+        post = Post.objects.get(author=self.user)
+        self.assertEqual((post.image_width, post.image_height), (10, 6))
+        with post.image.open('rb') as file, Image.open(file) as image:
+            self.assertEqual(image.size, (10, 6))
@@ -0,0 +1,61 @@
+# posts/tests/test_rendering.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+
+# CON - CONSTANTS
+CON = {
+    'USER_NAME': 'user_1',
+    # Разметка экранируется, длинная строка переносится,
+    # переводы строк становятся <br>.
+    'TEXT': '<b>Жирный & "кавычки"</b>\n' + 'слово ' * 40 + '\nконец',
+    'NEW_TEXT': 'Новый\nтекст',
+    'TEMPLATE': ('{{ text|wordwrap:120|linebreaksbr }}|'
+                 '{{ text|truncatechars_html:30 }}'),
+}
+
+
+def filtered(text):
+    '''Текст и заголовок, как их выводили шаблонные фильтры.'''
+    return Template(CON['TEMPLATE']).render(Context({'text': text}))
+
+
+class RenderedTextTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=CON['USER_NAME'])
+
+    def rendered(self, post):
+        post = Post.objects.get(pk=post.pk)
+        return f'{post.rendered_text}|{post.rendered_title}'
+
+    def test_saved_html_matches_template_filters(self):
+        '''При создании и изменении поста сохраняется тот же HTML,
+        что давали фильтры шаблона.'''
+        post = Post.objects.create(author=self.user, text=CON['TEXT'])
+        self.assertEqual(self.rendered(post), filtered(CON['TEXT']))
+        post.text = CON['NEW_TEXT']
+        post.save()
+        self.assertEqual(self.rendered(post), filtered(CON['NEW_TEXT']))
+
+    def test_render_posts_fills_old_posts(self):
+        '''Посты без готового HTML выводятся как раньше, а команда
+        render_posts заполняет его.'''
+        post = Post.objects.create(author=self.user, text=CON['TEXT'])
+        Post.objects.filter(pk=post.pk).update(rendered_text='',
+                                               rendered_title='')
+        url = reverse('posts:post_detail', args=(post.pk,))
+        text_html, title_html = filtered(CON['TEXT']).split('|')
+        response = self.client.get(url)
+        self.assertContains(response, text_html)
+        self.assertContains(response, title_html)
+        output = StringIO()
+        call_command('render_posts', batch_size=1, stdout=output)
+        self.assertIn('1', output.getvalue())
+        self.assertEqual(self.rendered(post), filtered(CON['TEXT']))
@@ -0,0 +1,110 @@
+# posts/tests/test_search.py
+from importlib import import_module
+from urllib.parse import urlencode
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..search import (INDEXED, _postgresql_index, install_index,
+                      search_groups, search_posts)
+
+# CON - CONSTANTS
+CON = {
+    'GROUP_SLUG': 'test-slug',
+    'GROUP_TITLE': 'Клуб любителей котов',
+    'GROUP_DESCRIPTION': 'Тестовое описание группы',
+    'USER_NAME': 'user_1',
+    'ADMIN_NAME': 'admin',
+    'QUERY': 'кот',
+}
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=CON['USER_NAME'])
+        cls.group = Group.objects.create(
+            title=CON['GROUP_TITLE'],
+            slug=CON['GROUP_SLUG'],
+            description=CON['GROUP_DESCRIPTION'],
+        )
+        cls.rare = Post.objects.create(
+            author=cls.author, text='Про собак и немного про кота')
+        cls.frequent = Post.objects.create(
+            author=cls.author, text='Кот, кот и ещё раз кот')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Про погоду')
+
+    def test_posts_are_ranked(self):
+        '''Находятся только подходящие посты, самые релевантные - первыми.'''
+        found = list(search_posts(CON['QUERY']))
+        self.assertEqual(found, [self.frequent, self.rare])
+
+    def test_index_follows_writes(self):
+        '''Изменение и удаление поста сразу отражаются в индексе.'''
+        other = Post.objects.get(pk=self.other.pk)
+        other.text = 'Кот смотрит на погоду'
+        other.save()
+        Post.objects.get(pk=self.frequent.pk).delete()
+        found = set(search_posts(CON['QUERY']))
+        self.assertEqual(found, {self.rare, self.other})
+        self.assertFalse(search_posts('погоду').exclude(pk=self.other.pk))
+
+    def test_groups_and_operators(self):
+        '''Сообщества ищутся по названию, спецсимволы запроса
+        не ломают поиск, пустой запрос ничего не находит.'''
+        self.assertEqual(list(search_groups('котов')), [self.group])
+        self.assertFalse(search_posts('"кот" OR NEAR(*'))
+        self.assertFalse(search_posts('   '))
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_search_page_is_cursor_paginated(self):
+        '''Страница поиска листается курсором с сохранением запроса.'''
+        client = Client()
+        response = client.get(reverse('posts:search'), {'q': CON['QUERY']})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), [self.frequent])
+        self.assertEqual(response.context['groups'], [self.group])
+        query = urlencode({'q': CON['QUERY']})
+        self.assertContains(
+            response, f'?{query}&amp;after={page_obj.next_cursor}')
+        response = client.get(reverse('posts:search'),
+                              {'q': CON['QUERY'],
+                               'after': page_obj.next_cursor})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), [self.rare])
+        self.assertFalse(page_obj.has_next())
+
+    def test_admin_uses_index(self):
+        '''Поиск в админке находит посты по индексу.'''
+        admin = User.objects.create_superuser(
+            CON['ADMIN_NAME'], 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': CON['QUERY']})
+        self.assertEqual(set(response.context['cl'].result_list),
+                         {self.frequent, self.rare})
+
+    def test_install_index_restores_triggers(self):
+        '''На SQLite пропавшие триггеры создаются заново,
+        а индекс перестраивается.'''
+        if connection.vendor != 'sqlite':
+            self.skipTest('триггеры FTS5 есть только на SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        post = Post.objects.create(author=self.author, text='Кот без индекса')
+        self.assertNotIn(post, search_posts(CON['QUERY']))
+        install_index(connection)
+        self.assertIn(post, search_posts(CON['QUERY']))
+
+    def test_migration_matches_install_index(self):
+        '''Миграция 0005_search строит индекс PostgreSQL с той же
+        конфигурацией и тем же SQL, что install_index и запросы.'''
+        migration = import_module('posts.migrations.0005_search')
+        expected = [sql for table, column in INDEXED.values()
+                    for sql in _postgresql_index(table, column)]
+        self.assertEqual(migration.INSTALL['postgresql'], expected)
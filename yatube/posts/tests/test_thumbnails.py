@@ -0,0 +1,159 @@
+# posts/tests/test_thumbnails.py
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from .. import thumbnails
+from ..models import Post, User
+
+# CON - CONSTANTS
+CON = {
+    'USER_NAME': 'user_1',
+    'POST_TEXT': 'Тестовый текст',
+    'PLACEHOLDER': 'Картинка обрабатывается',
+    'SMALL_GIF': (
+        b'\x47\x49\x46\x38\x39\x61\x02\x00'
+        b'\x01\x00\x80\x00\x00\x00\x00\x00'
+        b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+        b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+        b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+        b'\x0A\x00\x3B'
+    )
+}
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def small_gif(name='small.gif'):
+    return SimpleUploadedFile(name=name, content=CON['SMALL_GIF'],
+                              content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=CON['USER_NAME'])
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear_local()
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_upload_generates_all_sizes(self):
+        '''После загрузки через форму готовы миниатюры всех размеров,
+        и лента выводит их без заглушки.'''
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': CON['POST_TEXT'], 'image': small_gif()}
+        )
+        post = Post.objects.get(author=self.user)
+        self.assertTrue(thumbnails.is_ready(post.image))
+        response = self.authorized_client.get(reverse('posts:index'))
+        thumbnail = thumbnails.cached_thumbnail(post.image, 'card')
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, CON['PLACEHOLDER'])
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_placeholder_until_ready(self):
+        '''Пока миниатюры нет, шаблон выводит заглушку, не создавая
+        её в запросе; команда догоняет пропущенные картинки, и ни кэш,
+        ни ETag страниц заглушку не сохраняют.'''
+        post = Post.objects.create(author=self.user, text=CON['POST_TEXT'],
+                                   image=small_gif('backlog.gif'))
+        urls = (reverse('posts:index'),
+                reverse('posts:profile', args=(self.user.username,)),
+                reverse('posts:post_detail', args=(post.pk,)))
+        etags = {}
+        for url in urls:
+            response = self.authorized_client.get(url)
+            self.assertContains(response, CON['PLACEHOLDER'])
+            etags[url] = response['ETag']
+        self.assertFalse(thumbnails.is_ready(post.image))
+        call_command('generate_thumbnails', workers=0, stdout=StringIO())
+        self.assertTrue(thumbnails.is_ready(post.image))
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, CON['PLACEHOLDER'])
+
+    def test_broken_image_is_logged(self):
+        '''Отсутствующий или повреждённый файл не ломает генерацию:
+        ошибка пишется в журнал, generate возвращает False.'''
+        default.storage.save('posts/broken.gif', StringIO('не картинка'))
+        for name in ('posts/missing.gif', 'posts/broken.gif'):
+            with self.subTest(name=name):
+                with self.assertLogs('posts.thumbnails', 'ERROR'):
+                    self.assertFalse(thumbnails.generate(name))
+
+    @override_settings(THUMBNAIL_WORKERS=0, POST_IMAGE_WIDTHS=(320, 640),
+                       POST_IMAGE_FORMATS=('NOPE', 'WEBP', 'JPEG'))
+    def test_picture_lists_width_variants(self):
+        '''Карточка выводится как <picture> с источником на каждый
+        поддерживаемый формат и вариантом на каждую ширину.'''
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': CON['POST_TEXT'], 'image': small_gif()}
+        )
+        post = Post.objects.get(author=self.user)
+        formats = thumbnails.image_formats()
+        self.assertNotIn('NOPE', formats)
+        self.assertIn('JPEG', formats)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        for image_format in formats:
+            for width in (320, 640):
+                with self.subTest(image_format=image_format, width=width):
+                    variant = thumbnails.cached_thumbnail(
+                        post.image, thumbnails.variant_key(image_format,
+                                                           width))
+                    self.assertContains(response, f'{variant.url} {width}w')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_page_thumbnails_are_prefetched(self):
+        '''Записи о миниатюрах страницы читаются из базы одним
+        запросом, повторная отрисовка берёт их из LRU.'''
+        for index in range(3):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': CON['POST_TEXT'],
+                      'image': small_gif(f'page_{index}.gif')}
+            )
+        default.kvstore.clear_local()
+        for round_trips in (1, 0):
+            cache.clear()
+            with self.subTest(round_trips=round_trips):
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(reverse('posts:index'))
+                kvstore_queries = [query for query in queries
+                                   if 'thumbnail_kvstore' in query['sql']]
+                self.assertEqual(len(kvstore_queries), round_trips)
+
+    @override_settings(THUMBNAIL_WORKERS=0, THUMBNAIL_LRU_SIZE=2)
+    def test_lru_is_bounded(self):
+        '''LRU хранит не больше THUMBNAIL_LRU_SIZE записей.'''
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': CON['POST_TEXT'], 'image': small_gif()}
+        )
+        self.assertLessEqual(len(default.kvstore._lru), 2)
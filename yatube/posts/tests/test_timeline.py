@@ -0,0 +1,82 @@
+# posts/tests/test_timeline.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry, User
+
+# CON - CONSTANTS
+CON = {
+    'USER_1_NAME': 'user_1',
+    'USER_2_NAME': 'user_2',
+    'USER_3_NAME': 'user_3',
+    'POST_TEXT': 'Тестовый текст',
+    'TIMELINE_LENGTH': 3,
+    'TIMELINE_SLACK': 1,
+}
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=CON['USER_1_NAME'])
+        cls.author_2 = User.objects.create_user(username=CON['USER_2_NAME'])
+        cls.follower = User.objects.create_user(username=CON['USER_3_NAME'])
+        cls.authorized_follower = Client()
+        cls.authorized_follower.force_login(cls.follower)
+
+    def test_new_post_fans_out_to_followers(self):
+        '''Новый пост появляется в ленте подписчика, но не автора.'''
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text=CON['POST_TEXT'])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post).exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.author).exists())
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        '''Подписка добавляет в ленту старые посты автора,
+        отписка их удаляет.'''
+        post = Post.objects.create(author=self.author, text=CON['POST_TEXT'])
+        self.authorized_follower.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        response = self.authorized_follower.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+        self.authorized_follower.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.follower).exists())
+
+    @override_settings(TIMELINE_LENGTH=CON['TIMELINE_LENGTH'],
+                       TIMELINE_SLACK=CON['TIMELINE_SLACK'])
+    def test_timeline_is_capped(self):
+        '''Публикация ленту не обрезает, команда trim_timelines
+        обрезает её до TIMELINE_LENGTH, оставляя новые посты.'''
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=str(i))
+                 for i in range(CON['TIMELINE_LENGTH']
+                                + CON['TIMELINE_SLACK'] + 1)]
+        kept = TimelineEntry.objects.filter(user=self.follower)
+        self.assertEqual(kept.count(), len(posts))
+        call_command('trim_timelines', batch_size=1, stdout=StringIO())
+        self.assertEqual(
+            list(kept.values_list('post_id', flat=True)),
+            [post.id for post in posts[::-1][:CON['TIMELINE_LENGTH']]]
+        )
+
+    def test_rebuild_command(self):
+        '''Команда rebuild_timelines восстанавливает ленту
+        по таблице подписок.'''
+        Follow.objects.create(user=self.follower, author=self.author_2)
+        post = Post.objects.create(author=self.author_2,
+                                   text=CON['POST_TEXT'])
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            [(self.follower.id, post.id)]
+        )
@@ -7,10 +7,14 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post, User
+from ..feeds import LazyLoadError, render_feed
+from ..models import Comment, Follow, Group, Post, User
+from ..paginators import CursorPaginator, encode_cursor
 
 # CON - CONSTANTS
 CON = {
@@ -21,7 +25,6 @@ CON = {
     'GROUP_2_SLUG': 'best-slug',
     'GROUP_2_TITLE': 'Тестовая группа 2',
     'GROUP_2_DESCRIPTION': 'Тестовое описание группы 2',
-    'TEMP_CACHE_TIME': 10,
     'LAST_POST_IND': 16,
     # NUM_DIF_POSTS it is NUMBER_OF_DIFFERENT_POSTS
     'NUM_DIF_POSTS': 3,
@@ -268,6 +271,228 @@ class PostPagesTests(TestCase):
             self.assertNotEqual(post_in_group_id, post.pk)
 
 
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=CON['USER_1_NAME'])
+        cls.group = Group.objects.create(
+            title=CON['GROUP_1_TITLE'],
+            slug=CON['GROUP_1_SLUG'],
+            description=CON['GROUP_1_DESCRIPTION'],
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Текст {i}')
+            for i in range(CON['LAST_POST_IND'])
+        )
+        # Одинаковая дата у всех постов: порядок задаёт второй ключ id.
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        cls.ordered_ids = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_follow_keyset_order(self):
+        '''Страницы по токенам after/before покрывают все посты
+        без пропусков и повторов.'''
+        paginator = CursorPaginator(Post.objects.all(),
+                                    settings.POSTS_PER_PAGE)
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        ids = [post.id for post in first] + [post.id for post in second]
+        self.assertEqual(ids, self.ordered_ids)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(second.has_next())
+        back = paginator.get_page(before=second.previous_cursor)
+        self.assertEqual([post.id for post in back],
+                         [post.id for post in first])
+
+    def test_broken_cursor_returns_first_page(self):
+        '''Повреждённый токен отдаёт первую страницу.'''
+        paginator = CursorPaginator(Post.objects.all(),
+                                    settings.POSTS_PER_PAGE)
+        page = paginator.get_page(after='не-токен')
+        self.assertEqual(page[0].id, self.ordered_ids[0])
+
+    def test_mistyped_cursor_returns_first_page(self):
+        '''Целый токен с неподходящими типами значений - тоже
+        первая страница, а не ошибка сервера.'''
+        paginator = CursorPaginator(Post.objects.all(),
+                                    settings.POSTS_PER_PAGE)
+        tokens = (encode_cursor([5, 1]), encode_cursor([[1], {}]),
+                  encode_cursor(['не дата', 1]), encode_cursor([True, 1]),
+                  encode_cursor([1]))
+        for token in tokens:
+            with self.subTest(token=token):
+                page = paginator.get_page(after=token)
+                self.assertEqual(page[0].id, self.ordered_ids[0])
+                self.assertFalse(page.has_previous())
+        post_id = self.ordered_ids[0]
+        adresses = (CON['POSTS_INDEX_URL'], CON['GROUP_1_URL'],
+                    reverse('posts:search') + '?q=Текст&',
+                    reverse('posts:post_comments', args=(post_id,)))
+        for adress in adresses:
+            separator = '' if adress.endswith('&') else '?'
+            for param in ('after', 'before'):
+                for token in (encode_cursor([5, 1]),
+                              encode_cursor(['ранг', 1])):
+                    with self.subTest(adress=adress, param=param,
+                                      token=token):
+                        response = self.client.get(
+                            f'{adress}{separator}{param}={token}')
+                        self.assertEqual(response.status_code, 200)
+
+    def test_cursor_mode_in_views(self):
+        '''Ленты переходят в курсорный режим по параметру ?after=.'''
+        adresses = (CON['POSTS_INDEX_URL'],
+                    CON['GROUP_1_URL'],
+                    CON['POSTS_PROFILE_USER_1_URL'])
+        for adress in adresses:
+            with self.subTest(adress=adress):
+                response = self.client.get(adress + '?after=')
+                page_obj = response.context['page_obj']
+                self.assertTrue(page_obj.is_cursor)
+                response = self.client.get(
+                    f'{adress}?after={page_obj.next_cursor}')
+                self.assertEqual(
+                    len(response.context['page_obj']),
+                    CON['LAST_POST_IND'] - settings.POSTS_PER_PAGE
+                )
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_cursor_mode_setting(self):
+        '''Настройка POSTS_PAGINATION включает курсорный режим
+        без параметров в запросе.'''
+        response = self.client.get(CON['POSTS_PROFILE_USER_1_URL'])
+        self.assertTrue(response.context['page_obj'].is_cursor)
+        self.assertContains(response, '?after=')
+
+
+@override_settings(FEED_STRICT_LOADING=True)
+class FeedLoaderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=CON['USER_1_NAME'])
+        cls.follower = User.objects.create_user(username=CON['USER_2_NAME'])
+        cls.authorized_follower = Client()
+        cls.authorized_follower.force_login(cls.follower)
+        cls.group = Group.objects.create(
+            title=CON['GROUP_1_TITLE'],
+            slug=CON['GROUP_1_SLUG'],
+            description=CON['GROUP_1_DESCRIPTION'],
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_posts(self, count):
+        for i in range(count):
+            Post.objects.create(author=self.author, group=self.group,
+                                text=f'Текст {i}')
+
+    def feed_queries(self):
+        '''Число запросов каждой ленты для текущего набора постов.'''
+        adresses = (CON['POSTS_INDEX_URL'],
+                    CON['GROUP_1_URL'],
+                    CON['POSTS_PROFILE_USER_1_URL'],
+                    reverse('posts:follow_index'))
+        queries = {}
+        for adress in adresses:
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                response = self.authorized_follower.get(adress)
+            self.assertEqual(response.status_code, 200)
+            queries[adress] = len(captured)
+        return queries
+
+    def test_feed_queries_do_not_grow_with_page_size(self):
+        '''Число запросов ленты не зависит от числа постов на странице.'''
+        self.create_posts(1)
+        one_post = self.feed_queries()
+        self.create_posts(settings.POSTS_PER_PAGE)
+        full_page = self.feed_queries()
+        self.assertEqual(one_post, full_page)
+
+    def test_template_lazy_load_fails(self):
+        '''В строгом режиме ленивая загрузка из шаблона - ошибка.'''
+        self.create_posts(1)
+        request = RequestFactory().get(CON['POSTS_INDEX_URL'])
+        request.user = self.author
+        page_obj = Post.objects.all()
+        with self.assertRaises(LazyLoadError):
+            render_feed(request, CON['POSTS_INDEX_TMP'],
+                        {'page_obj': page_obj})
+
+
+@override_settings(FEED_STRICT_LOADING=True)
+class PostDetailLoaderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=CON['USER_1_NAME'])
+        cls.group = Group.objects.create(
+            title=CON['GROUP_1_TITLE'],
+            slug=CON['GROUP_1_SLUG'],
+            description=CON['GROUP_1_DESCRIPTION'],
+        )
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Тестовый текст')
+        cls.url = reverse('posts:post_detail',
+                          kwargs={'post_id': cls.post.pk})
+
+    def detail_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_detail_queries_do_not_grow_with_comments(self):
+        '''Число запросов страницы поста не зависит от числа
+        комментариев и их авторов.'''
+        Comment.objects.create(post=self.post, author=self.user, text='1')
+        one_comment = self.detail_queries()
+        for i in range(settings.COMMENTS_PER_PAGE + 5):
+            author = User.objects.create_user(username=f'commenter_{i}')
+            Comment.objects.create(post=self.post, author=author, text=i)
+        many_comments = self.detail_queries()
+        self.assertEqual(one_comment, many_comments)
+        self.assertEqual(len(self.client.get(self.url).context['comments']),
+                         settings.COMMENTS_PER_PAGE)
+
+    def test_comments_fragment_returns_next_batch(self):
+        '''Фрагмент комментариев отдаёт следующую страницу по токену
+        и не повторяет комментарии первой страницы.'''
+        comments = [
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text=f'Комментарий {i}')
+            for i in range(settings.COMMENTS_PER_PAGE + 1)
+        ]
+        first_page = self.client.get(self.url).context['comments']
+        self.assertTrue(first_page.has_next())
+        fragment_url = reverse('posts:post_comments',
+                               kwargs={'post_id': self.post.pk})
+        self.assertContains(self.client.get(self.url),
+                            f'{fragment_url}?after={first_page.next_cursor}')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(
+                fragment_url, {'after': first_page.next_cursor})
+        self.assertEqual(len(captured), 1)
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(list(response.context['comments']), comments[:1])
+
+    def test_missing_post_returns_404(self):
+        '''Несуществующий пост - 404, а не 500.'''
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6}))
+        self.assertEqual(response.status_code, 404)
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class ImageInPostsTests(TestCase):
     @classmethod
@@ -343,7 +568,6 @@ class ImageInPostsTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
 
-# @override_settings(CACHE_TIME=TEMP_CACHE_TIME)
 class CachTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -351,24 +575,84 @@ class CachTests(TestCase):
         cls.CACHE_TEST_TEXT = 'Cache test text'
         cls.guest_client = Client()
         cls.user = User.objects.create_user(username=CON['USER_1_NAME'])
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
         cls.post = Post.objects.create(
             author=cls.user,
             text=cls.CACHE_TEST_TEXT,
         )
-        sleep(0.0001)
 
     def setUp(self):
         cache.clear()
 
     def test_index_cache(self):
+        '''Главная отдаётся из кэша, пока посты не менялись,
+        и сразу обновляется после удаления поста.'''
         response = self.guest_client.get(CON['POSTS_INDEX_URL'])
-        self.post.delete()
-        sleep(settings.CACHE_TIME - 1)
+        # Запись в обход модели не меняет версию - ответ из кэша.
+        Post.objects.filter(pk=self.post.pk).update(text='Другой текст')
         response_2 = self.guest_client.get(CON['POSTS_INDEX_URL'])
         self.assertEqual(response.content, response_2.content)
-        sleep(settings.CACHE_TIME + 1)
+        self.post.delete()
         response_3 = self.guest_client.get(CON['POSTS_INDEX_URL'])
         self.assertNotEqual(response_2.content, response_3.content)
+        self.assertNotContains(response_3, self.CACHE_TEST_TEXT)
+
+    def test_author_reads_own_post(self):
+        '''Автор видит свой новый и отредактированный пост сразу.'''
+        self.authorized_client.get(CON['POSTS_INDEX_URL'])
+        self.authorized_client.post(CON['POSTS_CREATE_URL'],
+                                    data={'text': 'Новый пост автора'})
+        response = self.authorized_client.get(CON['POSTS_INDEX_URL'])
+        self.assertContains(response, 'Новый пост автора')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Исправленный пост'}
+        )
+        response = self.authorized_client.get(CON['POSTS_INDEX_URL'])
+        self.assertContains(response, 'Исправленный пост')
+
+
+class FollowCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=CON['USER_1_NAME'])
+        cls.other = User.objects.create_user(username=CON['USER_2_NAME'])
+        cls.follower = User.objects.create_user(username=CON['USER_3_NAME'])
+        cls.authorized_follower = Client()
+        cls.authorized_follower.force_login(cls.follower)
+        cls.follow_url = reverse('posts:follow_index')
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.post = Post.objects.create(author=self.author,
+                                        text='Первый пост')
+
+    def test_follow_feed_is_cached(self):
+        '''Лента берётся из кэша, пока авторы не публикуют,
+        а посты посторонних авторов её не сбрасывают.'''
+        response = self.authorized_follower.get(self.follow_url)
+        Post.objects.filter(pk=self.post.pk).update(text='Другой текст')
+        Post.objects.create(author=self.other, text='Чужой пост')
+        response_2 = self.authorized_follower.get(self.follow_url)
+        self.assertEqual(response.content, response_2.content)
+
+    def test_author_post_invalidates_follow_feed(self):
+        '''Публикация автора сразу видна подписчику.'''
+        self.authorized_follower.get(self.follow_url)
+        Post.objects.create(author=self.author, text='Второй пост')
+        response = self.authorized_follower.get(self.follow_url)
+        self.assertContains(response, 'Второй пост')
+
+    def test_unfollow_invalidates_follow_feed(self):
+        '''Отписка сразу убирает посты автора из ленты.'''
+        self.authorized_follower.get(self.follow_url)
+        self.authorized_follower.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        response = self.authorized_follower.get(self.follow_url)
+        self.assertNotContains(response, 'Первый пост')
 
 
 class FollowTests(TestCase):
@@ -388,6 +672,9 @@ class FollowTests(TestCase):
         cls.authorized_nonfollower.force_login(cls.nonfollower)
         sleep(0.0001)
 
+    def setUp(self):
+        cache.clear()
+
     def test_auth_user_can_follow(self):
         '''Проверяет появление сведений о подписке в базе,
         после подписки.'''
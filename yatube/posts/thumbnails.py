@@ -0,0 +1,222 @@
+# posts/thumbnails.py
+'''Предварительная генерация миниатюр картинок постов.
+
+Размеры, которые используют шаблоны, перечислены в POST_THUMBNAILS;
+к ним добавляются адаптивные варианты карточки (sizes) - по одному
+на каждую ширину POST_IMAGE_WIDTHS и формат POST_IMAGE_FORMATS,
+из которых шаблон собирает <picture> со srcset (picture).
+После загрузки картинки (post_create, post_edit) миниатюры всех
+размеров создаются в фоновом пуле из THUMBNAIL_WORKERS потоков, когда
+транзакция зафиксирована. Шаблон берёт миниатюру только из хранилища
+ключей sorl-thumbnail (cached_thumbnail) и, пока её нет, выводит
+заглушку, не открывая исходный файл. Готовые миниатюры меняют версии
+кэша и ETag страниц с постами картинки (posts/caching.py), чтобы
+заглушка не осталась в кэше. Накопившиеся пропуски догоняет команда
+generate_thumbnails.
+'''
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import ThumbnailError
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+
+from . import caching
+
+logger = logging.getLogger(__name__)
+
+# Ошибки чтения и обработки картинки: файл не найден, не картинка,
+# слишком большая, не разбираются параметры sorl.
+THUMBNAIL_ERRORS = (OSError, ValueError, Image.DecompressionBombError,
+                    ThumbnailError)
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _options(source, options):
+    # Те же параметры по умолчанию, что дописывает
+    # ThumbnailBackend.get_thumbnail: от них зависит имя миниатюры.
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def image_formats():
+    '''Форматы из POST_IMAGE_FORMATS, которые умеют сохранять
+    и Pillow, и sorl-thumbnail; остальные пропускаются.'''
+    Image.init()
+    return [image_format for image_format in settings.POST_IMAGE_FORMATS
+            if image_format in Image.SAVE and image_format in EXTENSIONS]
+
+
+def variant_key(image_format, width):
+    return f'{image_format.lower()}-{width}'
+
+
+def sizes():
+    '''Все миниатюры, которые нужны шаблонам: POST_THUMBNAILS
+    и варианты карточки card по ширинам и форматам.'''
+    result = dict(settings.POST_THUMBNAILS)
+    geometry, options = settings.POST_THUMBNAILS['card']
+    card_width, card_height = map(int, geometry.split('x'))
+    for image_format in image_formats():
+        for width in settings.POST_IMAGE_WIDTHS:
+            height = round(width * card_height / card_width)
+            result[variant_key(image_format, width)] = (
+                f'{width}x{height}', {**options, 'format': image_format})
+    return result
+
+
+def _thumbnail_file(image, size, known_sizes):
+    geometry, options = known_sizes[size]
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _options(source, options))
+    return ImageFile(name, default.storage)
+
+
+def cached_thumbnail(image, size, known_sizes=None):
+    '''Готовая миниатюра размера size (ключ sizes())
+    из хранилища ключей или None. Файлы не открываются.'''
+    if not image:
+        return None
+    return default.kvstore.get(
+        _thumbnail_file(image, size, known_sizes or sizes()))
+
+
+@metrics.phase('thumbnail')
+def prefetch(posts):
+    '''Загружает записи о миниатюрах всех картинок страницы за один
+    раз, если хранилище ключей это умеет (posts/kvstore.py).'''
+    kvstore_prefetch = getattr(default.kvstore, 'prefetch', None)
+    if kvstore_prefetch is None:
+        return
+    known_sizes = sizes()
+    kvstore_prefetch([_thumbnail_file(post.image, size, known_sizes)
+                      for post in posts if post.image
+                      for size in known_sizes])
+
+
+def is_ready(image):
+    '''Готовы ли миниатюры картинки всех размеров.'''
+    known_sizes = sizes()
+    return all(cached_thumbnail(image, size, known_sizes) is not None
+               for size in known_sizes)
+
+
+@metrics.phase('thumbnail')
+def picture(image):
+    '''Данные для <picture>: запасная миниатюра card (img), источники
+    со srcset из готовых вариантов по форматам (sources) и признак
+    того, что готовы все варианты (complete). None, пока нет card.'''
+    known_sizes = sizes()
+    fallback = cached_thumbnail(image, 'card', known_sizes)
+    if fallback is None:
+        return None
+    sources = []
+    complete = True
+    for image_format in image_formats():
+        srcset = []
+        for width in settings.POST_IMAGE_WIDTHS:
+            thumbnail = cached_thumbnail(
+                image, variant_key(image_format, width), known_sizes)
+            if thumbnail is None:
+                complete = False
+            else:
+                srcset.append(f'{thumbnail.url} {width}w')
+        if srcset:
+            sources.append({
+                'type': MIME_TYPES.get(image_format,
+                                       f'image/{image_format.lower()}'),
+                'srcset': ', '.join(srcset),
+            })
+    return {'img': fallback,
+            'sources': sources,
+            'sizes': settings.POST_IMAGE_SIZES,
+            'complete': complete,
+            }
+
+
+def generate(name):
+    '''Создаёт миниатюры всех размеров для картинки name.
+    Возвращает False, если картинку не удалось обработать.'''
+    try:
+        for geometry, options in sizes().values():
+            get_thumbnail(name, geometry, **options)
+    except THUMBNAIL_ERRORS:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        return False
+    # Ошибки чтения исходника sorl пишет в журнал сам и возвращает
+    # несозданную миниатюру: в хранилище ключей её тогда нет.
+    if not is_ready(name):
+        logger.error('Не удалось создать миниатюры для %s', name)
+        return False
+    caching.bump_image_version(name)
+    return True
+
+
+def _generate_in_worker(name):
+    try:
+        return generate(name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        # Соединения с базой принадлежат потоку пула.
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _submit(name):
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    _get_executor().submit(_generate_in_worker, name)
+
+
+def schedule(image):
+    '''Ставит генерацию миниатюр картинки в очередь после фиксации
+    транзакции. При THUMBNAIL_WORKERS = 0 создаёт их сразу.'''
+    name = getattr(image, 'name', image)
+    if not name:
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        generate(name)
+        return
+    transaction.on_commit(lambda: _submit(name))
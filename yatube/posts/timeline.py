@@ -0,0 +1,111 @@
+# posts/timeline.py
+'''Материализованная лента подписок (fan-out on write).
+
+Каждый новый пост копируется в ленты подписчиков автора, подписка
+добавляет в ленту последние посты автора, отписка их удаляет.
+Лента каждого пользователя ограничена TIMELINE_LENGTH записями.
+Публикация ленты не обрезает: подсчёт записей у каждого подписчика
+стоил бы автору с большим числом подписчиков лишних секунд в запросе.
+Их обрезает по расписанию команда trim_timelines (trim_all), а также
+подписка и пересборка - для своей ленты.
+'''
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Follow, Post, TimelineEntry, User
+
+
+def _entry(user_id, post):
+    return TimelineEntry(user_id=user_id, post_id=post.id,
+                         author_id=post.author_id, pub_date=post.pub_date)
+
+
+def trim_timelines(user_ids):
+    '''Обрезает до TIMELINE_LENGTH ленты тех пользователей из user_ids,
+    чьи ленты выросли больше чем на TIMELINE_SLACK записей.'''
+    length = settings.TIMELINE_LENGTH
+    overflowing = (
+        TimelineEntry.objects.filter(user_id__in=list(user_ids))
+        .order_by()
+        .values('user_id')
+        .annotate(entries=Count('id'))
+        .filter(entries__gt=length + settings.TIMELINE_SLACK)
+        .values_list('user_id', flat=True)
+    )
+    trimmed = 0
+    for user_id in overflowing:
+        entries = TimelineEntry.objects.filter(user_id=user_id)
+        border = entries.values_list('pub_date', 'post_id')[length:length + 1]
+        for pub_date, post_id in border:
+            entries.filter(pub_date__lte=pub_date).exclude(
+                pub_date=pub_date, post_id__gt=post_id).delete()
+        trimmed += 1
+    return trimmed
+
+
+def trim_all(batch_size):
+    '''Обрезает все ленты, проходя пользователей пачками по
+    batch_size; возвращает число обрезанных лент.'''
+    trimmed = 0
+    last_id = 0
+    while True:
+        user_ids = list(User.objects.filter(pk__gt=last_id).order_by('pk')
+                        .values_list('pk', flat=True)[:batch_size])
+        if not user_ids:
+            return trimmed
+        trimmed += trim_timelines(user_ids)
+        last_id = user_ids[-1]
+
+
+@transaction.atomic
+def fan_out_post(post):
+    '''Рассылает новый пост в ленты всех подписчиков автора.'''
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True).iterator()
+    batch = []
+    for user_id in followers:
+        batch.append(user_id)
+        if len(batch) == settings.TIMELINE_BATCH_SIZE:
+            _fan_out_batch(post, batch)
+            batch = []
+    if batch:
+        _fan_out_batch(post, batch)
+
+
+def _fan_out_batch(post, user_ids):
+    TimelineEntry.objects.bulk_create(
+        (_entry(user_id, post) for user_id in user_ids),
+        ignore_conflicts=True
+    )
+
+
+@transaction.atomic
+def backfill(user_id, author_id):
+    '''Добавляет в ленту подписчика последние посты автора.'''
+    posts = (Post.objects.filter(author_id=author_id)
+             .order_by('-pub_date', '-id')
+             .only('id', 'author_id', 'pub_date')[:settings.TIMELINE_LENGTH])
+    TimelineEntry.objects.bulk_create(
+        (_entry(user_id, post) for post in posts),
+        ignore_conflicts=True
+    )
+    trim_timelines([user_id])
+
+
+def remove_author(user_id, author_id):
+    '''Удаляет из ленты подписчика посты автора.'''
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+@transaction.atomic
+def rebuild(user_id):
+    '''Пересобирает ленту пользователя с нуля по таблице подписок.'''
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = (Post.objects.filter(author__following__user_id=user_id)
+             .order_by('-pub_date', '-id')
+             .only('id', 'author_id', 'pub_date')[:settings.TIMELINE_LENGTH])
+    TimelineEntry.objects.bulk_create(
+        (_entry(user_id, post) for post in posts)
+    )
@@ -0,0 +1,33 @@
+# posts/uploadhandlers.py
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class ImageSizeLimitHandler(FileUploadHandler):
+    '''Первый обработчик загрузки (FILE_UPLOAD_HANDLERS): считает байты
+    каждого файла и перестаёт передавать дальше данные файла, который
+    превысил IMAGE_UPLOAD_MAX_BYTES, так что остаток не попадает ни
+    в память, ни на диск. Такой файл приходит в request.FILES пустым,
+    с признаком oversized и числом полученных байт в size.
+    '''
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.oversized = True
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.oversized:
+            return None
+        upload = SimpleUploadedFile(self.file_name, b'', self.content_type)
+        upload.size = self.received
+        upload.oversized = True
+        return upload
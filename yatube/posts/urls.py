@@ -1,7 +1,5 @@
 # posts/urls.py
-from django.conf import settings
 from django.urls import path
-from django.views.decorators.cache import cache_page
 
 from . import views
 
@@ -15,6 +13,9 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -26,5 +27,5 @@ urlpatterns = [
         views.profile_unfollow,
         name="profile_unfollow"
     ),
-    path('', cache_page(settings.CACHE_TIME)(views.index), name='index'),
+    path('', views.index, name='index'),
 ]
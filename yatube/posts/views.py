@@ -1,25 +1,25 @@
 # posts/views.py
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
 
+from . import images
+from .caching import cache_follow_feed, cache_index
+from .counters import user_stats
+from .etags import group_etag, index_etag, post_etag, profile_etag
+from .feeds import load_comments, load_feed, load_post_detail, render_feed
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-
-
-def posts_paginator(request, posts, context):
-    '''Функция добавляет в контекст паджинатор для
-    функциий index, group_posts и profile.
-    '''
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context['page_obj'] = page_obj
-    return context
+from .models import Follow, Group, Post, TimelineEntry, User
+from .search import SEARCH_KEYS, search_groups, search_posts
 
 
+@condition(etag_func=index_etag)
+@cache_index
 def index(request):
     '''Функция отображения главной страницы, выводит 10 сообщений,
     отсортированных по дате от большей к меньшей,
@@ -28,10 +28,11 @@ def index(request):
     template = 'posts/index.html'
     posts = Post.objects.all()
     context = {}
-    context = posts_paginator(request, posts, context)
-    return render(request, template, context)
+    context = load_feed(request, posts, context)
+    return render_feed(request, template, context)
 
 
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
     '''Функция отображения страницы сообщества (группы), выводит 10 сообщений
     сообщества (группы),  отсортированных по дате от большей к меньшей,
@@ -41,10 +42,11 @@ def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.all()
     context = {'group': group}
-    context = posts_paginator(request, posts, context)
-    return render(request, template, context)
+    context = load_feed(request, posts, context)
+    return render_feed(request, template, context)
 
 
+@condition(etag_func=profile_etag)
 def profile(request, username):
     '''Функция выводит все сообщения пользователя.'''
     template = 'posts/profile.html'
@@ -58,33 +60,53 @@ def profile(request, username):
         if Follow.objects.filter(user=request.user, author=author).exists():
             following = True
     context = {'author': author,
-               'following': following
+               'following': following,
+               'stats': user_stats(author),
                }
-    context = posts_paginator(request, posts, context)
-    return render(request, template, context)
+    context = load_feed(request, posts, context)
+    return render_feed(request, template, context)
+
+
+def search(request):
+    '''Функция выводит найденные по запросу ?q= сообщества и посты,
+    от самых релевантных, с курсорными страницами.'''
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    groups = search_groups(query)[:settings.SEARCH_GROUPS_LIMIT]
+    context = {'query': query,
+               'groups': list(groups),
+               'cursor_query': urlencode({'q': query}) + '&',
+               }
+    context = load_feed(request, search_posts(query), context,
+                        keys=SEARCH_KEYS, cursor=True)
+    return render_feed(request, template, context)
 
 
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
     '''Функция выводит подробности о сообщении, в том числе и
     кнопку "редактировать".
     '''
     template = 'posts/post_detail.html'
-    post = Post.objects.get(pk=post_id)
-    author = get_object_or_404(get_user_model(), id=post.author_id)
-    comment_form = CommentForm(request.POST or None)
-    if post.group_id is None:
-        group_name = ''
-    else:
-        group_name = Group.objects.get(pk=post.group_id).title
-    context = {'post': post,
-               'author': author,
-               'group_name': group_name,
-               'form': comment_form
+    # Пост, автор, сообщество, счётчики автора и первая страница
+    # комментариев загружаются за постоянное число запросов.
+    context = load_post_detail(post_id)
+    context['form'] = CommentForm(request.POST or None)
+    return render_feed(request, template, context)
+
+
+def post_comments(request, post_id):
+    '''Функция отдаёт фрагмент со следующей страницей комментариев
+    поста, начиная после токена ?after=.'''
+    template = 'posts/includes/comments.html'
+    context = {'comments': load_comments(post_id, request.GET.get('after')),
+               'post_id': post_id,
                }
-    return render(request, template, context)
+    return render_feed(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     '''Функция создаёт новое сообщение.'''
     template = 'posts/create_post.html'
@@ -98,11 +120,13 @@ def post_create(request):
         instance_form = form.save(commit=False)
         instance_form.author = request.user
         instance_form.save()
+        images.process_upload(instance_form)
         return redirect('posts:profile', request.user.username)
     return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     '''Функция редактирует сообщение пользователя.'''
     template = 'posts/create_post.html'
@@ -115,8 +139,11 @@ def post_edit(request, post_id):
         if request.method == 'POST' and form.is_valid():
             post.text = form.cleaned_data['text']
             post.group = form.cleaned_data['group']
+            image_changed = 'image' in form.changed_data
             form = PostForm(request.POST, instance=post)
             post.save()
+            if image_changed:
+                images.process_upload(post)
             return redirect('posts:post_detail', post_id)
         context = {'form': form,
                    'post_id': post_id,
@@ -127,6 +154,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -138,21 +166,24 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cache_follow_feed
 def follow_index(request):
     '''Функция демонстрирует ленту постов от авторов,
     на которых подписан пользователь.'''
     # Функция используется при переходе 'follow/'
     context = {}
     template = 'posts/follow.html'
-    # Берутся посты авторов, для которых в базе данных есть запись в таблице
-    # posts_follow, но только тех из них, в чьих записях есть соответствие
-    # текущему пользователю
-    posts = Post.objects.filter(author__following__user=request.user)
-    context = posts_paginator(request, posts, context)
-    return render(request, template, context)
+    # Лента заполняется при публикации (posts/timeline.py), поэтому
+    # страница читается одним проходом по индексу (user, pub_date)
+    # без соединения с таблицей подписок.
+    entries = TimelineEntry.objects.filter(user=request.user)
+    context = load_feed(request, entries, context,
+                        keys=('-pub_date', '-post_id'), through='post')
+    return render_feed(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     '''Функция осуществляет подписку на автора, предположительно
     со страницы профиля автора.'''
@@ -163,6 +194,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
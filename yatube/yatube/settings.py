@@ -4,6 +4,7 @@ Using Django 2.2.24.
 """
 
 import os
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -36,21 +37,28 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replicas.ReplicaMiddleware',
+    'core.metrics.ServerTimingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Тесты идут с настройками core.testing.TEST_SETTINGS.
+TEST_RUNNER = 'core.testing.TestRunner'
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, который замеряет время отрисовки (core/metrics.py).
+        'BACKEND': 'core.templates.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,7 +86,38 @@ DATABASES = {
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT')
     }
-} 
+}
+# Реплики только для чтения (core/replicas.py): хосты PostgreSQL через
+# запятую в DB_REPLICA_HOSTS, остальные параметры - как у default.
+# Для локальной проверки на SQLite - пути к файлам в DB_REPLICA_NAMES
+# (например, копия файла default). Тесты запускаются без реплик:
+# маршрутизацию проверяет core/tests/test_replicas.py.
+DATABASE_REPLICAS = []
+for field, values in (('HOST', os.getenv('DB_REPLICA_HOSTS', '')),
+                      ('NAME', os.getenv('DB_REPLICA_NAMES', ''))):
+    for value in filter(None, values.split(',')):
+        alias = f'replica_{len(DATABASE_REPLICAS) + 1}'
+        DATABASES[alias] = {**DATABASES['default'], field: value,
+                            'TEST': {'MIRROR': 'default'}}
+        DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Вьюхи, которые читают с реплики.
+DATABASE_REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:follow_index',
+    'posts:search',
+)
+# Приложения, которые всегда читают с основной базы: сессии и записи
+# о миниатюрах только что созданы и на реплику могли не доехать.
+DATABASE_PRIMARY_APPS = ('sessions', 'thumbnail')
+# После записи пользователь DATABASE_STICKY_SECONDS секунд читает
+# только с основной базы (кука DATABASE_STICKY_COOKIE).
+DATABASE_STICKY_COOKIE = 'primary_db'
+DATABASE_STICKY_SECONDS = 30
 
 
 # Password validation
@@ -122,6 +161,19 @@ if DEBUG:
 else:
     STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 STATIC_URL = '/static/'
+# collectstatic пишет имена с хешем содержимого и сжатые копии
+# .gz/.br (core/staticfiles.py).
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+# Сжимаются файлы с этими расширениями не меньше STATIC_COMPRESS_MIN_SIZE
+# байт; .br пишется, только если установлен пакет brotli.
+STATIC_COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.ico', '.txt',
+                              '.json', '.xml', '.html', '.map')
+STATIC_COMPRESS_MIN_SIZE = 256
+# Отдавать STATIC_ROOT из WSGI-приложения, когда перед ним нет прокси.
+# Файлы с хешем в имени кэшируются навсегда, остальные -
+# STATIC_MAX_AGE секунд.
+SERVE_STATIC = os.getenv('SERVE_STATIC', 'False') == 'True'
+STATIC_MAX_AGE = 60
 # STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 # STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
@@ -132,11 +184,54 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
+# Кэш общий для всех процессов (memcached): в нём лежат версии, по
+# которым сбрасываются кэш главной, лент и ETag. Локальный кэш процесса
+# (CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache) годится
+# только для одного процесса: с ним кэш страниц живёт LOCAL_CACHE_TIME.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.memcached.MemcachedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', '127.0.0.1:11211'),
     }
 }
+PROCESS_LOCAL_CACHE = CACHES['default']['BACKEND'].endswith(
+    ('LocMemCache', 'DummyCache'))
+LOCAL_CACHE_TIME = 2
+
+# Метрики вьюх (core/metrics.py): процессы раз в METRICS_FLUSH_INTERVAL
+# секунд складывают их в общий кэш, /metrics/ отдаёт сумму
+# в формате Prometheus сотрудникам и запросам с заголовком
+# "Authorization: Bearer <METRICS_TOKEN>" (пустой токен - выключено).
+METRICS_NAMESPACE = 'yatube'
+METRICS_FLUSH_INTERVAL = 10
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Адреса, которым метрики доступны без токена; по умолчанию - никому.
+# Проверяется REMOTE_ADDR, поэтому за обратным прокси на том же хосте
+# под список попадает любой запрос: там используйте METRICS_TOKEN.
+METRICS_ALLOWED_IPS = tuple(
+    ip for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip)
+# Границы корзин гистограмм времени (секунды) и числа SQL-запросов.
+METRICS_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                           1, 2.5, 5, 10)
+METRICS_QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+# Запросы дольше METRICS_SLOW_REQUEST секунд пишутся в журнал вместе
+# с METRICS_SLOW_REQUEST_QUERIES самыми долгими SQL-запросами.
+METRICS_SLOW_REQUEST = 1
+METRICS_SLOW_REQUEST_QUERIES = 5
+# Заголовок Server-Timing в ответах этих приложений; сотрудник
+# переключает его для запроса заголовком X-Server-Timing: 1 или 0.
+SERVER_TIMING = True
+SERVER_TIMING_APPS = ('posts', 'users', 'about')
+
+# Первый обработчик ограничивает объём загружаемых картинок
+# (posts/uploadhandlers.py), остальные - стандартные.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploadhandlers.ImageSizeLimitHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 
 # Email
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
@@ -145,6 +240,79 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 # Settings used in applications
 
 POSTS_PER_PAGE = 10
+# 'offset' - нумерованные страницы (Paginator, COUNT(*) + OFFSET),
+# 'cursor' - курсорные страницы по ключу (pub_date, id), ?after=/?before=.
+POSTS_PAGINATION = os.getenv('POSTS_PAGINATION', 'offset')
+
+# Загрузка лент (posts/feeds.py)
+# Сколько запросов может выполнить загрузка одной страницы ленты.
+FEED_QUERY_BUDGET = 3
+# То же для страницы поста: пост с автором и сообществом, комментарии.
+DETAIL_QUERY_BUDGET = 2
+# Сколько комментариев выводится на странице поста.
+COMMENTS_PER_PAGE = 20
+# Строгий режим: превышение бюджета и запросы из шаблона ленты
+# завершаются ошибкой LazyLoadError.
+FEED_STRICT_LOADING = DEBUG
+
+# Денормализованные счётчики (posts/counters.py)
+# Размер пачки команды reconcile_counters.
+COUNTERS_BATCH_SIZE = 1000
+
+# Материализованная лента подписок (posts/timeline.py)
+# Максимальная длина ленты одного пользователя.
+TIMELINE_LENGTH = 1000
+# Лента обрезается до TIMELINE_LENGTH (командой trim_timelines по
+# расписанию), только когда превышает его на TIMELINE_SLACK записей.
+TIMELINE_SLACK = 100
+# Размер пачки bulk_create при рассылке поста подписчикам
+# и пачки пользователей команды trim_timelines.
+TIMELINE_BATCH_SIZE = 1000
+
+# Полнотекстовый поиск (posts/search.py)
+# Сколько сообществ выводится над найденными постами.
+SEARCH_GROUPS_LIMIT = 5
+
+# Сведения о картинках постов (posts/images.py)
+# Размер пачки команды backfill_image_metadata.
+IMAGE_BACKFILL_BATCH_SIZE = 500
+# Наибольший объём загружаемой картинки в байтах и наибольшее число
+# пикселей (по заголовку, до декодирования).
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+# Картинки больше IMAGE_MAX_SIDE пикселей по большей стороне
+# уменьшаются после загрузки в пуле из IMAGE_PROCESS_WORKERS
+# процессов; 0 - уменьшать сразу в запросе.
+IMAGE_MAX_SIDE = 2560
+IMAGE_PROCESS_WORKERS = int(os.getenv('IMAGE_PROCESS_WORKERS', 2))
+
+# Готовый HTML текста поста (posts/rendering.py)
+# Ширина переноса строк текста и длина заголовка страницы поста.
+# После смены - render_posts --all.
+POST_WRAP_WIDTH = 120
+POST_TITLE_LENGTH = 30
+# Размер пачки команды render_posts.
+POST_RENDER_BATCH_SIZE = 500
+
+# Миниатюры картинок постов (posts/thumbnails.py)
+# Размеры, которые используют шаблоны: имя -> (геометрия, параметры sorl).
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Адаптивные варианты карточки для <picture>/srcset: ширины в пикселях
+# и форматы в порядке предпочтения. Форматы, которые не умеет
+# сохранять установленный Pillow или sorl-thumbnail, пропускаются.
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+# Атрибут sizes: ширина карточки на экране.
+POST_IMAGE_SIZES = '(min-width: 992px) 960px, 100vw'
+# Хранилище ключей sorl-thumbnail с LRU в памяти процесса
+# (posts/kvstore.py): сколько записей и сколько секунд оно хранит.
+THUMBNAIL_KVSTORE = 'posts.kvstore.LRUKVStore'
+THUMBNAIL_LRU_SIZE = 10000
+THUMBNAIL_LRU_TIMEOUT = 300
+# Потоков фоновой генерации миниатюр; 0 - создавать их сразу в запросе.
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
 
 # Localization
 
@@ -167,9 +335,31 @@ POST_NAME = 'запись'
 POSTS_NAME = 'записи'
 FOLLOW_NAME = 'подписку'
 FOLLOWS_NAME = 'Подписки'
+TIMELINE_NAME = 'запись ленты'
+TIMELINES_NAME = 'Ленты подписок'
+# Counters
+POSTS_COUNT_NAME = 'число записей'
+COMMENTS_COUNT_NAME = 'число комментариев'
+FOLLOWERS_COUNT_NAME = 'число подписчиков'
+FOLLOWING_COUNT_NAME = 'число подписок'
+USER_STATS_NAME = 'Счётчики пользователя'
+IMAGE_WIDTH_NAME = 'ширина картинки'
+IMAGE_HEIGHT_NAME = 'высота картинки'
+IMAGE_FORMAT_NAME = 'формат картинки'
+IMAGE_SIZE_NAME = 'размер картинки в байтах'
+IMAGE_HASH_NAME = 'SHA-256 картинки'
+RENDERED_TEXT_NAME = 'HTML текста поста'
+RENDERED_TITLE_NAME = 'HTML заголовка поста'
 
 # 403
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
-# TestCache
-CACHE_TIME = 2
+# Кэш главной страницы (posts/caching.py); инвалидируется по версии
+# в общем кэше, поэтому время жизни может быть большим.
+INDEX_CACHE_TIME = (LOCAL_CACHE_TIME if PROCESS_LOCAL_CACHE
+                    else 60 * 60 * 24)
+# Кэш карточек постов (posts/cards.py); ключ меняется при правке поста.
+CARD_CACHE_TIME = 60 * 60 * 24
+# Кэш ленты подписок: сколько первых страниц кэшировать и как долго.
+FOLLOW_CACHE_PAGES = 3
+FOLLOW_CACHE_TIME = LOCAL_CACHE_TIME if PROCESS_LOCAL_CACHE else 60 * 60
@@ -3,10 +3,13 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('metrics/', metrics, name='metrics'),
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about'))
 ]
@@ -1,7 +1,13 @@
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+if settings.SERVE_STATIC:
+    from core.staticfiles import StaticFilesApplication
+
+    application = StaticFilesApplication(application)